@@ -1,6 +1,13 @@
+from . import analytics
+from . import columnar_store
 from . import config
 from . import data_loader
+from . import data_sources
+from . import fast_engine
+from . import indicator_cache
+from . import portfolio
 from . import strategy
+from . import sweep
 from . import trade_tracker
 from . import visualization
 
@@ -0,0 +1,154 @@
+import json
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+# Additive per-backtest and per-strategy sums, kept up to date by TradeTracker.flush. Ratios are
+# derived from them in the *_stats views so updating a summary never needs the trades again.
+SUMMARY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS backtest_summary(
+    backtest_id INTEGER PRIMARY KEY REFERENCES backtests(id),
+    strategy_id TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    sweep_id TEXT,
+    trades INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    pnl_sum REAL NOT NULL,
+    gross_profit REAL NOT NULL,
+    gross_loss REAL NOT NULL,
+    duration_sum INTEGER NOT NULL,
+    median_pnl REAL
+);
+CREATE INDEX IF NOT EXISTS backtest_summary_strategy ON backtest_summary(strategy_id);
+
+CREATE TABLE IF NOT EXISTS strategy_summary(
+    strategy_id TEXT PRIMARY KEY,
+    backtests INTEGER NOT NULL,
+    trades INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    pnl_sum REAL NOT NULL,
+    gross_profit REAL NOT NULL,
+    gross_loss REAL NOT NULL,
+    duration_sum INTEGER NOT NULL
+);
+
+CREATE VIEW IF NOT EXISTS backtest_stats AS
+SELECT backtest_id, strategy_id, ticker, sweep_id, trades,
+       CAST(wins AS REAL) / NULLIF(trades, 0) AS win_rate,
+       pnl_sum / NULLIF(trades, 0) AS mean_pnl,
+       median_pnl,
+       CAST(duration_sum AS REAL) / NULLIF(trades, 0) AS avg_duration,
+       gross_profit / NULLIF(gross_loss, 0) AS profit_factor
+FROM backtest_summary;
+
+CREATE VIEW IF NOT EXISTS strategy_stats AS
+SELECT strategy_id, backtests, trades,
+       CAST(wins AS REAL) / NULLIF(trades, 0) AS win_rate,
+       pnl_sum / NULLIF(trades, 0) AS mean_pnl,
+       CAST(duration_sum AS REAL) / NULLIF(trades, 0) AS avg_duration,
+       gross_profit / NULLIF(gross_loss, 0) AS profit_factor
+FROM strategy_summary;
+"""
+
+# Median of the pnl of each group, rows numbered (n + 1) / 2 and (n + 2) / 2 are the middle one or two
+_MEDIAN_PNL = """
+WITH ranked AS (
+    SELECT {group} AS grp, t.pnl,
+           ROW_NUMBER() OVER (PARTITION BY {group} ORDER BY t.pnl) AS rn,
+           COUNT(*) OVER (PARTITION BY {group}) AS n
+    FROM trades t JOIN backtests b ON b.id = t.backtest_id
+    WHERE {where}
+)
+SELECT grp, AVG(pnl) FROM ranked WHERE rn IN ((n + 1) / 2, (n + 2) / 2) GROUP BY grp
+"""
+
+
+def create_tables(conn: sqlite3.Connection):
+    """Create the summary tables and views, filling them from the existing backtests if they are new"""
+    existed = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'backtest_summary'").fetchone()
+    conn.executescript(SUMMARY_SCHEMA)
+    if not existed:
+        backtest_ids = [row[0] for row in conn.execute("SELECT id FROM backtests ORDER BY id")]
+        if backtest_ids:
+            print(f"Summarizing {len(backtest_ids)} existing backtests")
+            update_summaries(conn, backtest_ids)
+
+
+def update_summaries(conn: sqlite3.Connection, backtest_ids):
+    """
+    Add newly written backtests (and their trades) to backtest_summary and strategy_summary.
+    Runs inside the caller's transaction, each backtest id must only be passed once.
+    """
+    if not backtest_ids:
+        return
+    ids = json.dumps(list(backtest_ids))
+    conn.execute("""
+        INSERT INTO backtest_summary
+        (backtest_id, strategy_id, ticker, sweep_id, trades, wins, pnl_sum, gross_profit, gross_loss, duration_sum)
+        SELECT b.id, b.strategy_id, b.ticker, b.sweep_id, COUNT(t.id), COUNT(CASE WHEN t.pnl > 0 THEN 1 END),
+               TOTAL(t.pnl), TOTAL(CASE WHEN t.pnl > 0 THEN t.pnl END), TOTAL(CASE WHEN t.pnl < 0 THEN -t.pnl END),
+               TOTAL(t.duration)
+        FROM backtests b LEFT JOIN trades t ON t.backtest_id = b.id
+        WHERE b.id IN (SELECT value FROM json_each(?))
+        GROUP BY b.id
+    """, (ids,))
+    conn.executemany("UPDATE backtest_summary SET median_pnl = ? WHERE backtest_id = ?",
+                     [(median, backtest_id) for backtest_id, median in conn.execute(
+                         _MEDIAN_PNL.format(group="t.backtest_id",
+                                            where="t.backtest_id IN (SELECT value FROM json_each(?))"), (ids,))])
+    conn.execute("""
+        INSERT INTO strategy_summary
+        (strategy_id, backtests, trades, wins, pnl_sum, gross_profit, gross_loss, duration_sum)
+        SELECT strategy_id, COUNT(*), SUM(trades), SUM(wins), SUM(pnl_sum), SUM(gross_profit), SUM(gross_loss),
+               SUM(duration_sum)
+        FROM backtest_summary
+        WHERE backtest_id IN (SELECT value FROM json_each(?))
+        GROUP BY strategy_id
+        ON CONFLICT(strategy_id) DO UPDATE SET
+            backtests = backtests + excluded.backtests,
+            trades = trades + excluded.trades,
+            wins = wins + excluded.wins,
+            pnl_sum = pnl_sum + excluded.pnl_sum,
+            gross_profit = gross_profit + excluded.gross_profit,
+            gross_loss = gross_loss + excluded.gross_loss,
+            duration_sum = duration_sum + excluded.duration_sum
+    """, (ids,))
+
+
+def rebuild_summaries(db_path="trades.db"):
+    """Recompute both summary tables from scratch, e.g. after trades were edited by hand"""
+    with closing(sqlite3.connect(db_path)) as conn, conn:
+        conn.execute("DROP TABLE IF EXISTS backtest_summary")
+        conn.execute("DROP TABLE IF EXISTS strategy_summary")
+        create_tables(conn)
+
+
+def strategy_stats(db_path="trades.db", strategy_ids=None, median=False) -> pd.DataFrame:
+    """
+    One row per strategy_id: backtests, trades, win_rate, mean_pnl, avg_duration and profit_factor
+    (gross profit / gross loss, NaN without losing trades), read from strategy_summary.
+    median=True adds median_pnl over all the strategy's trades, which has to scan them.
+    """
+    selected, params = "strategy_id IN (SELECT value FROM json_each(?))", (json.dumps(list(strategy_ids or [])),)
+    if strategy_ids is None:
+        selected, params = "1", ()
+    with closing(sqlite3.connect(db_path)) as conn:
+        stats = pd.read_sql_query(f"SELECT * FROM strategy_stats WHERE {selected} ORDER BY strategy_id", conn,
+                                  params=params)
+        if median:
+            medians = dict(conn.execute(_MEDIAN_PNL.format(group="b.strategy_id", where=f"b.{selected}"
+                                                           if strategy_ids is not None else "1"), params))
+            stats['median_pnl'] = stats['strategy_id'].map(medians)
+    return stats
+
+
+def backtest_stats(db_path="trades.db", strategy_id=None, ticker=None, sweep_id=None) -> pd.DataFrame:
+    """One row per backtest with the same columns as strategy_stats plus ticker, sweep_id and median_pnl"""
+    filters = {"strategy_id": strategy_id, "ticker": ticker, "sweep_id": sweep_id}
+    filters = {column: value for column, value in filters.items() if value is not None}
+    where = " AND ".join(f"{column} = ?" for column in filters)
+    with closing(sqlite3.connect(db_path)) as conn:
+        stats = pd.read_sql_query(f"SELECT * FROM backtest_stats{' WHERE ' + where if where else ''} "
+                                  f"ORDER BY backtest_id", conn, params=tuple(filters.values()))
+    return stats
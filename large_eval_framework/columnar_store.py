@@ -0,0 +1,155 @@
+import os
+import shutil
+import threading
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from . import data_loader as dl
+
+# Column order of the frames returned by load(), same as DataLoader's sqlite cache
+COLUMNS = ('Open', 'Close', 'High', 'Low', 'Volume')
+
+
+class ColumnarStore:
+    """
+    Daily OHLCV kept as one directory per ticker with a memory-mapped .npy file per column
+    (date as datetime64[ns], prices as float64, volume as int64), sorted by date.
+    Loading a date range is two binary searches and zero-copy slices of the mapped columns,
+    so the returned frames are read-only views.
+    Pass one as DataLoader(store=...) to use it instead of the stock_data table.
+    """
+
+    def __init__(self, path="ohlcv_store"):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._columns = {}  # ticker -> (inode of its directory, {column: memmap})
+        self._lock = threading.Lock()
+
+    def tickers(self):
+        return sorted(unquote(d.name) for d in self.path.iterdir() if d.is_dir() and not d.name.endswith('.tmp'))
+
+    def load(self, ticker, start_date=None, end_date=None):
+        """OHLCV of ticker between start_date and end_date (inclusive), None if the ticker isn't stored"""
+        columns = self._open(ticker)
+        if columns is None:
+            return None
+        lo, hi = self._bounds(columns['date'], start_date, end_date)
+        return pd.DataFrame({name: columns[name][lo:hi] for name in COLUMNS},
+                            index=pd.DatetimeIndex(columns['date'][lo:hi], name='date'), copy=False)
+
+    def dates(self, ticker, start_date=None, end_date=None) -> pd.DatetimeIndex:
+        columns = self._open(ticker)
+        if columns is None:
+            return pd.DatetimeIndex([], dtype='datetime64[ns]', name='date')
+        lo, hi = self._bounds(columns['date'], start_date, end_date)
+        return pd.DatetimeIndex(columns['date'][lo:hi], name='date')
+
+    def write(self, ticker, data: pd.DataFrame):
+        """
+        Merge data (Open/High/Low/Close/Volume indexed by date) into ticker's columns.
+        Dates already stored keep their values, like the sqlite cache's INSERT OR IGNORE.
+        """
+        new = pd.DataFrame(dl.ohlcv_columns(ticker, data), columns=list(COLUMNS))
+        new.index = self._day_index(data.index)
+
+        with self._lock:
+            existing = self.load(ticker)
+            merged = new if existing is None else pd.concat([existing, new])
+            merged = merged[~merged.index.duplicated(keep='first')].sort_index()
+
+            directory = self._dir(ticker)
+            tmp_dir = directory.with_name(f"{directory.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_dir.mkdir()
+            np.save(tmp_dir / "date.npy", merged.index.to_numpy(dtype='datetime64[ns]'))
+            for name in COLUMNS:
+                np.save(tmp_dir / f"{name}.npy",
+                        merged[name].to_numpy(dtype=np.int64 if name == 'Volume' else np.float64))
+
+            # Swap the directories; readers that already mapped the old columns keep valid views
+            old_dir = directory.with_name(f"{directory.name}.{os.getpid()}.old.tmp")
+            if directory.exists():
+                os.rename(directory, old_dir)
+            os.rename(tmp_dir, directory)
+            shutil.rmtree(old_dir, ignore_errors=True)
+            self._columns.pop(ticker, None)
+
+    def delete(self, ticker):
+        with self._lock:
+            shutil.rmtree(self._dir(ticker), ignore_errors=True)
+            self._columns.pop(ticker, None)
+
+    def __getstate__(self):
+        # Mapped columns and the lock stay in this process
+        state = self.__dict__.copy()
+        state['_columns'] = {}
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    # --- Private methods below ---
+
+    def _dir(self, ticker) -> Path:
+        return self.path / quote(str(ticker), safe='')
+
+    def _open(self, ticker):
+        directory = self._dir(ticker)
+        try:
+            inode = os.stat(directory).st_ino
+        except FileNotFoundError:
+            self._columns.pop(ticker, None)
+            return None
+        cached = self._columns.get(ticker)
+        if cached is not None and cached[0] == inode:
+            return cached[1]
+        try:
+            columns = {name: np.load(directory / f"{name}.npy", mmap_mode='r') for name in ('date',) + COLUMNS}
+        except FileNotFoundError:  # replaced while we were opening it
+            return self._open(ticker)
+        self._columns[ticker] = (inode, columns)
+        return columns
+
+    @staticmethod
+    def _bounds(dates, start_date, end_date):
+        lo = 0 if start_date is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date), 'ns'), 'left'))
+        hi = len(dates) if end_date is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(end_date), 'ns'), 'right'))
+        return lo, max(lo, hi)
+
+    @staticmethod
+    def _day_index(index):
+        # The cache is daily and keyed by calendar date, like stock_data's 'YYYY-MM-DD'
+        index = pd.DatetimeIndex(index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        return index.normalize().as_unit('ns')
+
+
+def migrate_sqlite_cache(db_path='yfinance_cache.db', store_path="ohlcv_store", tickers=None) -> ColumnarStore:
+    """Copy every ticker (or just `tickers`) of a DataLoader sqlite cache into a ColumnarStore"""
+    loader = dl.DataLoader(db_path)
+    store = ColumnarStore(store_path)
+    with loader._db() as conn:
+        spans = conn.execute("SELECT ticker, MIN(date), MAX(date) FROM stock_data GROUP BY ticker ORDER BY ticker").fetchall()
+    if tickers is not None:
+        tickers = set(tickers)
+        spans = [span for span in spans if span[0] in tickers]
+
+    for ticker, first, last in tqdm(spans, desc="Migrating tickers"):
+        first, last = loader._parse_dates([first, last])
+        data = loader._get_cached_data(ticker, first, last)
+        if not data.empty:
+            store.write(ticker, data)
+    loader.close()
+    print(f"Migrated {len(spans)} tickers from {db_path} to {store_path}")
+    return store
+
+
+if __name__ == "__main__":
+    import sys
+    migrate_sqlite_cache(*sys.argv[1:3])
@@ -1,5 +1,11 @@
-import yfinance as yf
 import sqlite3
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 import sys
 from termcolor import colored, cprint
@@ -9,70 +15,234 @@ from io import StringIO
 
 from tqdm import tqdm
 
+from . import data_sources as ds
+
+
+# Applied to every connection: WAL lets readers run while a writer appends, and NORMAL sync
+# is safe in WAL mode while avoiding an fsync per transaction
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA mmap_size=268435456",
+)
+
+
+# Intervals served by resampling cached daily bars instead of downloading them
+RESAMPLED_INTERVALS = ('1wk', '1mo', '3mo')
+
+BAR_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Gap runs missing fewer weekdays than this (plain weekends, one-day holidays) are left out of the coverage index
+MIN_INDEXED_GAP_RUN = 3
+
+
+def _gap_runs(keys, days, min_missing):
+    """
+    Runs of consecutive gaps (rows more than a day after the previous one) in sorted dates, as
+    [terminator key, [[key of the row before the gap, weekdays missing], ...]]. The terminator is
+    the first row that follows its predecessor by one day, runs without one are never counted.
+    Runs missing fewer than min_missing weekdays in total are left out.
+    """
+    diff = np.diff(days)
+    missing = np.maximum(0, diff - 2)  # Subtract weekend days
+    # Rows ending a run: one day after the previous row, right after a gap
+    ends = np.flatnonzero((diff[1:] == 1) & (diff[:-1] > 1)) + 1
+    starts = np.flatnonzero((diff > 1) & np.concatenate(([True], diff[:-1] == 1)))
+    runs = []
+    for end in ends:
+        start = starts[np.searchsorted(starts, end) - 1]
+        if missing[start:end].sum() >= min_missing:
+            runs.append([keys[end + 1], [[keys[i], int(missing[i])] for i in range(start, end)]])
+    return runs
+
+
+def _today() -> pd.Timestamp:
+    """The current session's date. Its daily bar is still forming, so it is never cached."""
+    return pd.Timestamp.today().normalize()
+
+
+def ohlcv_column(data: pd.DataFrame, name) -> np.ndarray:
+    """A price or volume column of a downloaded frame as float64"""
+    column = data[name]
+    if isinstance(column, pd.DataFrame):  # e.g. un-flattened MultiIndex columns
+        column = column.iloc[:, 0]
+    return column.to_numpy(dtype=np.float64)
+
+
+def ohlcv_columns(ticker, data: pd.DataFrame) -> dict:
+    """Open, Close, High and Low (float64) and Volume (int64) of a downloaded frame, as the caches store them"""
+    columns = {name: ohlcv_column(data, name) for name in ('Open', 'Close', 'High', 'Low', 'Volume')}
+    if np.isnan(columns['Volume']).any():
+        raise ValueError(f"cannot cache {ticker}: Volume has NaN values")
+    columns['Volume'] = columns['Volume'].astype(np.int64)
+    return columns
+
+
+def resample_ohlcv(data: pd.DataFrame, interval) -> pd.DataFrame:
+    """
+    Daily bars aggregated into '1wk' (weeks starting on Monday), '1mo' or '3mo' bars labelled
+    with their first calendar day like yfinance's: first open, highest high, lowest low,
+    last close and total volume.
+    """
+    days = data.index.to_numpy(dtype='datetime64[D]')
+    if interval == '1wk':
+        # 1970-01-01 was a Thursday, shift by 3 days so weeks start on Monday
+        periods = (days.astype(np.int64) + 3) // 7
+        labels = (periods * 7 - 3).astype('datetime64[D]')
+    elif interval in ('1mo', '3mo'):
+        months = 1 if interval == '1mo' else 3
+        periods = days.astype('datetime64[M]').astype(np.int64) // months
+        labels = (periods * months).astype('datetime64[M]').astype('datetime64[D]')
+    else:
+        raise ValueError(f"cannot resample daily bars to {interval}")
+    if not len(days):
+        return data.copy()
+
+    starts = np.flatnonzero(np.concatenate(([True], periods[1:] != periods[:-1])))
+    ends = np.append(starts[1:], len(days)) - 1
+    return pd.DataFrame({
+        'Open': data['Open'].to_numpy()[starts],
+        'Close': data['Close'].to_numpy()[ends],
+        'High': np.fmax.reduceat(data['High'].to_numpy(dtype=np.float64), starts),
+        'Low': np.fmin.reduceat(data['Low'].to_numpy(dtype=np.float64), starts),
+        'Volume': np.add.reduceat(data['Volume'].to_numpy(), starts),
+    }, index=pd.DatetimeIndex(labels[starts], name=data.index.name))
+
 
 class DataLoader:
 
-    def __init__(self, path = 'yfinance_cache.db'):
+    def __init__(self, path = 'yfinance_cache.db', int_dates = False, store = None, source = None, http = None):
+        """
+        int_dates: store stock_data dates as YYYYMMDD integers instead of 'YYYY-MM-DD' text.
+            Only applies to a new database; an existing stock_data table keeps its date type.
+        store: a columnar_store.ColumnarStore to cache daily OHLCV in instead of the stock_data
+            table (see columnar_store.migrate_sqlite_cache). Other tables stay in the database.
+        source: where missing data is downloaded from, anything with YFinanceSource's
+            download(ticker, start_date, end_date, interval) and download_batch, defaults to
+            data_sources.YFinanceSource()
+        http: what the symbol lists are requested with, anything with requests' get/post
+            (e.g. a stub in tests), defaults to the requests module
+        """
         self.path = path
+        self.int_dates = int_dates
+        self.store = store
+        self.source = source or ds.YFinanceSource()
+        self.http = http
+        self._conn = None
+        self._conn_pid = None
+        self._lock = threading.RLock()
         self._setup_db()
 
     def fetch_data(self, ticker, start_date, end_date, interval='1d'):
         """
         Smart data fetcher that uses cached data when available,
-        otherwise downloads fresh data and caches it.
-        Returns data formatted for backtesting.py
+        downloads only the date ranges missing from the cache and caches them.
+        Weekly, monthly and quarterly bars are resampled from the cached daily bars,
+        other intervals (intraday) are cached separately.
+        Returns data formatted for backtesting.py, end_date included
         If fetching fails, returns None and prints a warning.
         """
         try:
-            # First check cache (only for daily data)
-            if interval == '1d' and self._data_available_in_cache(ticker, start_date, end_date):
+            if interval in RESAMPLED_INTERVALS:
+                data = self.fetch_data(ticker, start_date, end_date)
+                return None if data is None else resample_ohlcv(data, interval)
+            if interval != '1d':
+                return self._fetch_bars(ticker, start_date, end_date, interval)
+
+            missing = self._missing_ranges(ticker, start_date, end_date)
+            for start, end in missing:
+                overlap = self._overlap_day(ticker, start)
+                print(f"Downloading {ticker} data from {start.date()} to {end.date()}")
+                self._store_download(ticker, overlap or start, end,
+                                     self.source.download(ticker, overlap or start, end), overlap)
+            if not missing:
                 print(f"Using cached data for {ticker}")
-                data = self._get_cached_data(ticker, start_date, end_date)
-            else:
-                # Download fresh data
-                print(f"Downloading fresh data for {ticker}")
-                data = yf.download(ticker, start=start_date, end=end_date, interval=interval)
-
-                # Handle MultiIndex if present
-                if isinstance(data.columns, pd.MultiIndex):
-                    data = data.xs(ticker, axis=1, level=1)
-
-                # Ensure we have all required columns
-                data = data[['Open', 'High', 'Low', 'Close', 'Volume']].copy()
-
-                # Cache daily data (skip for other intervals)
-                if interval == '1d':
-                    self._cache_data(ticker, start_date, end_date, data)
-
-            return data
+            return self._get_cached_data(ticker, start_date, end_date)
         except Exception as e:
             print(f"[WARNING] Failed to fetch/process data for {ticker} from {start_date} to {end_date}: {e}")
             return None
 
-    def get_all_symbols(self):
+    def get_all_symbols(self, max_age_hours=24, refresh=False):
+        """
+        NASDAQ and NYSE symbols. Served from the latest stored snapshot while it is younger than
+        max_age_hours, otherwise requested again and stored as a new snapshot (if nothing changed,
+        only the latest snapshot's time is updated). Falls back to the latest snapshot when the
+        request fails.
+        """
+        latest = self._latest_symbol_snapshot()
+        if latest is not None and not refresh:
+            fetched_at, symbols = latest
+            if datetime.now() - fetched_at < timedelta(hours=max_age_hours):
+                print(f"Using {len(symbols)} symbols from {fetched_at:%Y-%m-%d %H:%M}")
+                return symbols
         try:
             nasdaq = self._get_nasdaq_symbols()
             nyse = self._get_nyse_symbols()
-            print(f"Found {len(nasdaq.union(nyse))} symbols")
-            return nasdaq.union(nyse)
+            symbols = nasdaq.union(nyse)
+            if not symbols:
+                raise ValueError("the exchanges returned no symbols")
+            print(f"Found {len(symbols)} symbols")
         except Exception as e:
             print(f"Error fetching symbols: {e}")
-            return set()
+            return latest[1] if latest is not None else set()
 
-    def filter_good_tickers(self, tickers, save_path="good_tickers.csv"):
-        """Returns DataFrame of valid tickers with their max timespans"""
-        results = []
-        for ticker in tqdm(tickers, desc="Screening tickers"):
-            has_data, start_date, end_date = self._check_ticker_data_quality(ticker)
-            if end_date is not None and start_date is not None:
-                duration_days = (pd.to_datetime(end_date) - pd.to_datetime(start_date)).days
+        with self._db() as conn:
+            last = conn.execute("SELECT id, symbols FROM symbol_snapshots ORDER BY id DESC LIMIT 1").fetchone()
+            fetched_at = datetime.now().isoformat(timespec='seconds')
+            if last is not None and set(json.loads(last[1])) == symbols:
+                conn.execute("UPDATE symbol_snapshots SET fetched_at = ? WHERE id = ?", (fetched_at, last[0]))
             else:
-                duration_days = None
-            if has_data:
-                results.append({'ticker': ticker, 'start_date': start_date, 'end_date': end_date,
-                                'duration_days': duration_days})
+                conn.execute("INSERT INTO symbol_snapshots(fetched_at, symbols) VALUES(?,?)",
+                             (fetched_at, json.dumps(sorted(symbols))))
+        return symbols
+
+    def symbol_changes(self):
+        """(added, removed) symbols of the latest symbol snapshot compared to the one before it"""
+        with self._db() as conn:
+            rows = conn.execute("SELECT symbols FROM symbol_snapshots ORDER BY id DESC LIMIT 2").fetchall()
+        if not rows:
+            return set(), set()
+        latest = set(json.loads(rows[0][0]))
+        previous = set(json.loads(rows[1][0])) if len(rows) > 1 else set()
+        return latest - previous, previous - latest
+
+    def filter_good_tickers(self, tickers, save_path="good_tickers.csv", workers=4, warm_cache=True, resume=True,
+                            max_age_hours=24):
+        """
+        Returns DataFrame of valid tickers with their max timespans
+        Batches of tickers are screened by `workers` threads (the source still limits its concurrent
+        requests) and every result is stored in the screening table as it comes in. With
+        resume=True, tickers screened less than max_age_hours ago are skipped: an interrupted screen
+        continues where it stopped, and screening a newer get_all_symbols() universe only screens
+        the new symbols. Older screens are done again, so the timespans follow the source.
+        warm_cache: keep the downloaded history of good tickers in the cache, so backtesting them
+            doesn't download it again
+        """
+        tickers = list(dict.fromkeys(tickers))
+        screened = self._screened_tickers(max_age_hours) if resume else set()
+        todo = [ticker for ticker in tickers if ticker not in screened]
+        batch_size = self.source.batch_size
+        batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
 
-        df = pd.DataFrame(results)
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="screening")
+        try:
+            futures = [executor.submit(self._screen_batch, batch, warm_cache) for batch in batches]
+            with tqdm(total=len(tickers), initial=len(tickers) - len(todo), desc="Screening tickers") as progress:
+                for future in as_completed(futures):
+                    progress.update(future.result())
+        except KeyboardInterrupt:
+            print("Interrupted. Screened tickers are saved, rerun with resume=True to continue.")
+            raise
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        with self._db() as conn:
+            good = pd.read_sql_query("""SELECT ticker, start_date, end_date, duration_days FROM screening
+                WHERE has_data = 1""", conn)
+        good_tickers = set(good['ticker'])
+        df = good.set_index('ticker').reindex([t for t in tickers if t in good_tickers]).reset_index()
 
         if save_path:
             df.to_csv(save_path, index=False)
@@ -80,14 +250,122 @@ class DataLoader:
 
         return df
 
+    def cache_tickers(self, requests, max_consecutive_missing=7):
+        """
+        Download what the cache is missing for many (ticker, start_date, end_date) at once.
+        Tickers missing the same date range share batched source requests, e.g. a daily update
+        of the whole universe is a handful of requests. Returns the tickers that failed.
+        """
+        groups = {}
+        for ticker, start_date, end_date in requests:
+            for start, end in self._missing_ranges(ticker, start_date, end_date, max_consecutive_missing):
+                overlap = self._overlap_day(ticker, start)
+                groups.setdefault((overlap or start, end, overlap is not None), []).append(ticker)
+
+        failed = []
+        for (start, end, overlaps), tickers in sorted(groups.items()):
+            print(f"Downloading {len(tickers)} tickers from {start.date()} to {end.date()}")
+            frames = self.source.download_batch(tickers, start, end)
+            for ticker in tickers:
+                try:
+                    self._store_download(ticker, start, end, frames[ticker], start if overlaps else None)
+                except Exception as e:
+                    print(f"[WARNING] Failed to cache {ticker} from {start.date()} to {end.date()}: {e!r}")
+                    failed.append(ticker)
+        return failed
+
+    def save_darvas_state(self, ticker, state: dict, last_date):
+        """Persist a DarvasBoxState.to_dict() snapshot for ticker, valid up to and including last_date"""
+        with self._db() as conn:
+            conn.execute("""INSERT OR REPLACE INTO darvas_state VALUES(?,?,?,?,?,?)""", (
+                ticker,
+                state['lookback_period'],
+                state['box_period'],
+                state['volume_lookback'],
+                pd.to_datetime(last_date).strftime('%Y-%m-%d'),
+                json.dumps(state)
+            ))
+
+    def load_darvas_state(self, ticker, lookback_period, box_period, volume_lookback):
+        """Returns (state dict, last_date) of the saved DarvasBoxState, or (None, None)"""
+        with self._db() as conn:
+            row = conn.execute("""SELECT state, last_date FROM darvas_state
+                WHERE ticker = ? AND lookback_period = ? AND box_period = ? AND volume_lookback = ?
+                """, (ticker, lookback_period, box_period, volume_lookback)).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._conn_pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+    def __getstate__(self):
+        # Connections and locks don't cross process boundaries, the copy reconnects lazily
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_conn_pid'] = None
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
     # --- Private methods below ---
 
+    @contextmanager
+    def _db(self):
+        """The loader's long-lived connection as one transaction, serialized across threads"""
+        if self._conn is not None and self._conn_pid != os.getpid():
+            # Inherited through fork: never reuse the parent's connection
+            self._lock = threading.RLock()
+            self._conn = None
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.path, check_same_thread=False)
+                self._conn_pid = os.getpid()
+                for pragma in SQLITE_PRAGMAS:
+                    self._conn.execute(pragma)
+            with self._conn:
+                yield self._conn
+
+    def _date_key(self, date):
+        """Key of a date in stock_data's date column"""
+        date = pd.Timestamp(date)
+        return date.year * 10000 + date.month * 100 + date.day if self.int_dates else date.strftime('%Y-%m-%d')
+
+    def _date_keys(self, index: pd.DatetimeIndex):
+        index = pd.DatetimeIndex(index)
+        if self.int_dates:
+            return (index.year * 10000 + index.month * 100 + index.day).to_numpy(dtype=np.int64).tolist()
+        return index.strftime('%Y-%m-%d').tolist()
+
+    def _key_days(self, keys) -> np.ndarray:
+        """Days since epoch of stock_data date keys"""
+        if self.int_dates:
+            keys = np.asarray(keys, dtype=np.int64)
+            months = (keys // 10000 - 1970) * 12 + keys // 100 % 100 - 1
+            return (months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64) + keys % 100 - 1)
+        return np.array(keys, dtype='datetime64[D]').astype(np.int64)
+
+    def _parse_dates(self, keys):
+        if self.int_dates:
+            keys = np.asarray(keys, dtype=np.int64)
+            return pd.to_datetime(pd.DataFrame({'year': keys // 10000, 'month': keys // 100 % 100, 'day': keys % 100}))
+        return pd.to_datetime(pd.Series(keys))
+
     def _setup_db(self):
-        with sqlite3.connect(self.path) as conn:
-            conn.execute("""
+        with self._db() as conn:
+            columns = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(stock_data)")}
+            if columns:
+                self.int_dates = columns['date'].upper() == 'INTEGER'
+            conn.execute(f"""
                 CREATE TABLE IF NOT EXISTS stock_data(
                     ticker TEXT, 
-                    date TEXT, 
+                    date {'INTEGER' if self.int_dates else 'TEXT'}, 
                     open REAL, 
                     close REAL, 
                     high REAL, 
@@ -95,36 +373,227 @@ class DataLoader:
                     volume, 
                     PRIMARY KEY (ticker, date))    
                 """)
+            # Per-ticker summary of stock_data, rebuilt whenever a ticker's rows are written.
+            # gap_runs is a JSON list of [terminator date, [[date before gap, weekdays missing], ...]]
+            # for every run of consecutive gaps that misses more than a long weekend
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS coverage(
+                    ticker TEXT PRIMARY KEY,
+                    first_date,
+                    last_date,
+                    row_count INTEGER,
+                    gap_runs TEXT)
+                """)
+            # Date range (end exclusive) each ticker has been downloaded for, so data the source
+            # doesn't have, like days before a listing, isn't requested again
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS download_spans(
+                    ticker TEXT PRIMARY KEY,
+                    start_date,
+                    end_date)
+                """)
+            # Bars of the intervals that aren't daily or resampled from daily, by exchange wall time
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS bars(
+                    ticker TEXT,
+                    interval TEXT,
+                    time TEXT,
+                    open REAL,
+                    close REAL,
+                    high REAL,
+                    low REAL,
+                    volume,
+                    PRIMARY KEY (ticker, interval, time))
+                """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS bar_spans(
+                    ticker TEXT,
+                    interval TEXT,
+                    start_date TEXT,
+                    end_date TEXT,
+                    PRIMARY KEY (ticker, interval))
+                """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS symbol_snapshots(
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    fetched_at TEXT,
+                    symbols TEXT)
+                """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS screening(
+                    ticker TEXT PRIMARY KEY,
+                    has_data INTEGER,
+                    start_date TEXT,
+                    end_date TEXT,
+                    duration_days INTEGER,
+                    screened_at TEXT)
+                """)
+            if 'screened_at' not in {row[1] for row in conn.execute("PRAGMA table_info(screening)")}:
+                # Screened before screens expired, those are done again on the next screen
+                conn.execute("ALTER TABLE screening ADD COLUMN screened_at TEXT")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS darvas_state(
+                    ticker TEXT,
+                    lookback_period INTEGER,
+                    box_period INTEGER,
+                    volume_lookback INTEGER,
+                    last_date TEXT,
+                    state TEXT,
+                    PRIMARY KEY (ticker, lookback_period, box_period, volume_lookback))
+                """)
 
     def _cache_data(self, ticker: str, start_date, end_date, data):
-        with sqlite3.connect(self.path) as conn:
-            for date, row in data.iterrows():
-                # Convert Volume to int safely
-                volume = int(row['Volume'].iloc[0]) if isinstance(row['Volume'], pd.Series) else int(row['Volume'])
-
-                conn.execute("""INSERT OR IGNORE INTO stock_data VALUES(?,?,?,?,?,?,?)
-                """, (
-                    ticker,
-                    date.strftime('%Y-%m-%d'),
-                    float(row['Open'].iloc[0] if isinstance(row['Open'], pd.Series) else row['Open']),
-                    float(row['Close'].iloc[0] if isinstance(row['Close'], pd.Series) else row['Close']),
-                    float(row['High'].iloc[0] if isinstance(row['High'], pd.Series) else row['High']),
-                    float(row['Low'].iloc[0] if isinstance(row['Low'], pd.Series) else row['Low']),
-                    volume
-                ))
+        index = pd.DatetimeIndex(data.index)
+        # Today's bar changes until the close, it is downloaded again once the day is over
+        data = data[(index.tz_localize(None) if index.tz is not None else index) < _today()]
+        if self.store is not None:
+            self.store.write(ticker, data)
             print(f"Cached {len(data)} days of {ticker} data")
+            return
+
+        columns = ohlcv_columns(ticker, data)
+        rows = zip(
+            [ticker] * len(data),
+            self._date_keys(data.index),
+            columns['Open'].tolist(),
+            columns['Close'].tolist(),
+            columns['High'].tolist(),
+            columns['Low'].tolist(),
+            columns['Volume'].tolist()
+        )
+        with self._db() as conn:
+            conn.executemany("""INSERT OR IGNORE INTO stock_data VALUES(?,?,?,?,?,?,?)""", rows)
+            self._update_coverage(conn, ticker)
+        print(f"Cached {len(data)} days of {ticker} data")
+
+    def _overlap_day(self, ticker, start):
+        """
+        The last cached day if a download from start extends the cache forward, to download again
+        with it. Only complete days are cached, so it is never today's still forming bar.
+        """
+        cached = self._cached_span(ticker)
+        if cached is None or start < cached[1]:
+            return None
+        return cached[1] - pd.Timedelta(days=1)
+
+    def _store_download(self, ticker, start, end, data, overlap=None):
+        """
+        Cache data downloaded from start to end and record the download.
+        overlap: the last cached day, which data was downloaded with again. The source's prices are
+            split and dividend adjusted; if its bar for that day changed, the cached history has an
+            old adjustment and the ticker's whole history is downloaded again instead of merged.
+        """
+        if overlap is not None and self._adjustment_changed(ticker, overlap, data):
+            spans = [span for span in (self._cached_span(ticker), self._downloaded_span(ticker)) if span is not None]
+            start = min(span[0] for span in spans)
+            print(f"{ticker} prices were adjusted since they were cached, downloading {start.date()} to {end.date()} again")
+            data = self.source.download(ticker, start, end)
+            if data.empty:
+                raise ValueError(f"re-downloading {ticker} returned no data")
+            self._delete_cached(ticker)
+        self._cache_data(ticker, start, end, data)
+        self._record_download(ticker, start, end)
+
+    def _adjustment_changed(self, ticker, day, data):
+        """Whether data's bar on day has other prices than the cached one (False if either is missing)"""
+        cached = self._get_cached_data(ticker, day, day)
+        index = pd.DatetimeIndex(data.index)
+        downloaded = data[(index.tz_localize(None) if index.tz is not None else index).normalize() == day]
+        if cached.empty or downloaded.empty:
+            return False
+        prices = ['Open', 'Close', 'High', 'Low']
+        new = np.array([ohlcv_column(downloaded, name)[0] for name in prices])
+        return not np.allclose(new, cached[prices].to_numpy(dtype=np.float64)[0], rtol=1e-6, atol=0)
+
+    def _delete_cached(self, ticker):
+        with self._db() as conn:
+            conn.execute("DELETE FROM download_spans WHERE ticker=?", (ticker,))
+            if self.store is None:
+                conn.execute("DELETE FROM stock_data WHERE ticker=?", (ticker,))
+                self._update_coverage(conn, ticker)
+        if self.store is not None:
+            self.store.delete(ticker)
+
+    def _fetch_bars(self, ticker, start_date, end_date, interval):
+        """Intraday (or other non-daily) bars through the bars table, downloading what's before or after its span"""
+        start = pd.Timestamp(start_date).normalize()
+        end = pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)
+        with self._db() as conn:
+            span = conn.execute("SELECT start_date, end_date FROM bar_spans WHERE ticker=? AND interval=?",
+                                (ticker, interval)).fetchone()
+        if span is None:
+            missing = [(start, end)]
+        else:
+            # Extend from the known span so it stays contiguous
+            known_start, known_end = pd.Timestamp(span[0]), pd.Timestamp(span[1])
+            missing = [(a, b) for a, b in ((start, known_start), (known_end, end))
+                       if a < b and np.busday_count(a.date(), b.date()) > 0]
+
+        for a, b in missing:
+            print(f"Downloading {interval} {ticker} data from {a.date()} to {b.date()}")
+            self._cache_bars(ticker, interval, self.source.download(ticker, a, b, interval))
+            with self._db() as conn:
+                last = conn.execute("SELECT MAX(time) FROM bars WHERE ticker=? AND interval=?",
+                                    (ticker, interval)).fetchone()[0]
+                # Like daily spans: not past the day of the last bar received, which is downloaded
+                # again (it may still be forming) unless it's over, and never including today
+                last_day = pd.Timestamp(last).normalize() + pd.Timedelta(days=1) if last is not None else a
+                b = max(a, min(b, last_day, _today()))
+                conn.execute("""INSERT INTO bar_spans VALUES(?,?,?,?)
+                    ON CONFLICT(ticker, interval) DO UPDATE SET
+                        start_date = min(start_date, excluded.start_date),
+                        end_date = max(end_date, excluded.end_date)
+                    """, (ticker, interval, a.strftime('%Y-%m-%d'), b.strftime('%Y-%m-%d')))
+        if not missing:
+            print(f"Using cached {interval} data for {ticker}")
+
+        with self._db() as conn:
+            df = pd.read_sql_query("""SELECT time, open, close, high, low, volume FROM bars
+                WHERE ticker = ? AND interval = ? AND time >= ? AND time < ?
+                ORDER BY time
+                """, conn, params=(ticker, interval, start.strftime(BAR_TIME_FORMAT), end.strftime(BAR_TIME_FORMAT)))
+        df['time'] = pd.to_datetime(df['time'], format=BAR_TIME_FORMAT)
+        df = df.set_index('time').rename_axis('Datetime')
+        df.columns = ['Open', 'Close', 'High', 'Low', 'Volume']
+        df['Volume'] = df['Volume'].astype(int)
+        df[['Open', 'Close', 'High', 'Low']] = df[['Open', 'Close', 'High', 'Low']].astype(float)
+        return df
+
+    def _cache_bars(self, ticker, interval, data):
+        index = pd.DatetimeIndex(data.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)  # Keep the exchange's wall time, like the daily cache keeps dates
+        columns = ohlcv_columns(ticker, data)
+        rows = zip(
+            [ticker] * len(data),
+            [interval] * len(data),
+            index.strftime(BAR_TIME_FORMAT).tolist(),
+            columns['Open'].tolist(),
+            columns['Close'].tolist(),
+            columns['High'].tolist(),
+            columns['Low'].tolist(),
+            columns['Volume'].tolist()
+        )
+        with self._db() as conn:
+            # Bars downloaded again replace the cached ones, e.g. those of a day that was still going on
+            conn.executemany("""INSERT OR REPLACE INTO bars VALUES(?,?,?,?,?,?,?,?)""", rows)
+        print(f"Cached {len(data)} {interval} bars of {ticker}")
 
     def _get_cached_data(self, ticker, start_date, end_date):
-        with sqlite3.connect(self.path) as conn:
+        if self.store is not None:
+            data = self.store.load(ticker, start_date, end_date)
+            return pd.DataFrame(columns=['Open', 'Close', 'High', 'Low', 'Volume']) if data is None else data
+
+        with self._db() as conn:
             query = """SELECT date, open, close, high, low, volume FROM stock_data
                 WHERE ticker = ? AND date BETWEEN ? and ?
                 ORDER BY date
                 """
-            df = pd.read_sql_query(query, conn, params=(ticker, start_date, end_date))
+            df = pd.read_sql_query(query, conn, params=(ticker, self._date_key(start_date), self._date_key(end_date)))
 
             if not df.empty:
                 # Convert types and set index
-                df['date'] = pd.to_datetime(df['date'])
+                df['date'] = self._parse_dates(df['date']).to_numpy()
                 df.set_index('date', inplace=True)
 
                 # Rename all columns at once to match yfinance format
@@ -141,58 +610,145 @@ class DataLoader:
         Check cache for problematic gaps (>N consecutive missing weekdays)
         Returns True if cache is good enough for backtesting
         """
-        with sqlite3.connect(self.path) as conn:
-            # Get cached dates sorted
-            dates = pd.to_datetime([
-                row[0] for row in conn.execute(
-                    "SELECT date FROM stock_data WHERE ticker=? AND date BETWEEN ? AND ? ORDER BY date",
-                    (ticker, start_date, end_date))
-            ])
-
-            if len(dates) < 2:  # Not enough data to check gaps
-                print("Not enough data points to analyze gaps")
-                return False
-
-            # Convert to DataFrame for easier analysis
-            df = pd.DataFrame({'date': dates})
-            df['day_diff'] = df['date'].diff().dt.days.fillna(1)
-
-            # Find all gaps > 1 day
-            gaps = df[df['day_diff'] > 1].copy()
-
-            # Add gap information
-            if not gaps.empty:
-                gaps['gap_start'] = gaps['date'].shift(1)
-                gaps['gap_end'] = gaps['date']
-                gaps['weekday_gap'] = gaps['day_diff'] - 2  # Subtract weekend days
-
-                # Find largest gap
-                largest_gap = gaps.loc[gaps['day_diff'].idxmax()]
-                print(f"Largest gap was {largest_gap['day_diff']} calendar days "
-                      f"from {largest_gap['gap_start'].date()} to {largest_gap['gap_end'].date()} "
-                      f"({max(0, largest_gap['weekday_gap'])} weekdays missing)")
-
-            # Find consecutive missing weekdays (gaps >1 day, ignoring weekends)
-            consecutive_missing = []
-            current_gap = 0
-
-            for diff in df['day_diff']:
-                if diff > 1:  # Found a gap
-                    # Only count weekdays in the gap (diff=2 could be weekend)
-                    gap_weekdays = max(0, diff - 2)  # Subtract weekend days
-                    current_gap += gap_weekdays
-                else:
-                    if current_gap > 0:
-                        consecutive_missing.append(current_gap)
-                    current_gap = 0
-
-            # Check if any gap exceeds our threshold
-            problematic_gaps = [g for g in consecutive_missing if g > max_consecutive_missing]
-
-            if problematic_gaps:
-                print(f"Found {len(problematic_gaps)} problematic gaps (> {max_consecutive_missing} weekdays missing)")
-                return False
-            return True
+        gaps = self._problematic_gaps(ticker, start_date, end_date, max_consecutive_missing)
+        if gaps is None:
+            print("Not enough data points to analyze gaps")
+            return False
+        if gaps:
+            print(f"Found {len(gaps)} problematic gaps (> {max_consecutive_missing} weekdays missing), "
+                  f"largest is {max(missing for _, _, missing in gaps)} weekdays")
+            return False
+        return True
+
+    def _problematic_gaps(self, ticker, start_date, end_date, max_consecutive_missing=7):
+        """
+        Gap runs in the cached range missing more than max_consecutive_missing weekdays, as
+        (date key of the row before the run, date key of the row ending it, weekdays missing).
+        None if the range doesn't have two cached rows to compare.
+        A gap run counts the weekdays missing over consecutive rows that are more than a day apart
+        (a weekend counts as one), runs starting before start_date only count from there on.
+        Uses the coverage index unless max_consecutive_missing is below what it keeps track of.
+        """
+        start_key, end_key = self._date_key(start_date), self._date_key(end_date)
+        if self.store is not None or max_consecutive_missing < MIN_INDEXED_GAP_RUN - 1:
+            dates = self._cached_dates(ticker, start_date, end_date)
+            if len(dates) < 2:
+                return None
+            runs = _gap_runs(self._date_keys(dates), dates.to_numpy(dtype='datetime64[D]').astype(np.int64), min_missing=1)
+        else:
+            coverage = self._coverage(ticker)
+            if coverage is None:
+                return None
+            first_date, last_date, row_count, runs = coverage
+            if row_count < 2 or last_date < start_key or first_date > end_key:
+                return None
+
+        problematic_gaps = []
+        for terminator, gaps in runs:
+            if start_key <= terminator <= end_key:
+                counted = [(gap_start, weekdays) for gap_start, weekdays in gaps if gap_start >= start_key]
+                missing = sum(weekdays for _, weekdays in counted)
+                if missing > max_consecutive_missing:
+                    problematic_gaps.append((counted[0][0], terminator, missing))
+        return problematic_gaps
+
+    def _missing_ranges(self, ticker, start_date, end_date, max_consecutive_missing=7):
+        """
+        [(start, end)] date ranges (end exclusive) to download so the cache covers start_date to
+        end_date: the part before or after what was downloaded or cached so far, and problematic
+        gaps that weren't downloaded yet (those that were are missing at the source too).
+        Ranges without business days are skipped.
+        """
+        start = pd.Timestamp(start_date).normalize()
+        # Today's bar isn't complete and days after it can't be downloaded yet
+        end = min(pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1), _today())
+        if end <= start:
+            return []
+        downloaded = self._downloaded_span(ticker)
+        spans = [span for span in (self._cached_span(ticker), downloaded) if span is not None]
+        if not spans:
+            return [(start, end)]
+
+        # Extend from what's known so each ticker's downloaded span stays contiguous
+        known_start, known_end = min(span[0] for span in spans), max(span[1] for span in spans)
+        missing = []
+        if start < known_start and np.busday_count(start.date(), known_start.date()) > 0:
+            missing.append((start, known_start))
+        for gap_start, gap_end, _ in self._problematic_gaps(ticker, start_date, end_date, max_consecutive_missing) or []:
+            gap_start, gap_end = self._parse_dates([gap_start, gap_end])
+            gap_start += pd.Timedelta(days=1)
+            if downloaded is None or gap_start < downloaded[0] or gap_end > downloaded[1]:
+                missing.append((gap_start, gap_end))
+        if end > known_end and np.busday_count(known_end.date(), end.date()) > 0:
+            missing.append((known_end, end))
+        return sorted(missing)
+
+    def _cached_span(self, ticker):
+        """(first cached date, day after the last one), None if nothing is cached"""
+        if self.store is not None:
+            dates = self.store.dates(ticker)
+            if not len(dates):
+                return None
+            first, last = dates[0], dates[-1]
+        else:
+            coverage = self._coverage(ticker)
+            if coverage is None:
+                return None
+            first, last = self._parse_dates(coverage[:2])
+        return first, last + pd.Timedelta(days=1)
+
+    def _downloaded_span(self, ticker):
+        with self._db() as conn:
+            row = conn.execute("SELECT start_date, end_date FROM download_spans WHERE ticker=?", (ticker,)).fetchone()
+        return None if row is None else tuple(self._parse_dates(row))
+
+    def _record_download(self, ticker, start, end):
+        """
+        Record start to end as downloaded, but not past the day after the last cached bar or
+        including today: the source may still publish those days (e.g. a fetch whose end is in the
+        future) or change today's bar
+        """
+        cached = self._cached_span(ticker)
+        end = min(end, cached[1] if cached is not None else start,
+                  _today())
+        with self._db() as conn:
+            conn.execute("""INSERT INTO download_spans VALUES(?,?,?)
+                ON CONFLICT(ticker) DO UPDATE SET
+                    start_date = min(start_date, excluded.start_date),
+                    end_date = max(end_date, excluded.end_date)
+                """, (ticker, self._date_key(start), self._date_key(end)))
+
+    def _cached_dates(self, ticker, start_date=None, end_date=None) -> pd.DatetimeIndex:
+        if self.store is not None:
+            return self.store.dates(ticker, start_date, end_date)
+        query, params = "SELECT date FROM stock_data WHERE ticker=?", (ticker,)
+        if start_date is not None:
+            query, params = query + " AND date BETWEEN ? AND ?", params + (self._date_key(start_date), self._date_key(end_date))
+        with self._db() as conn:
+            return pd.DatetimeIndex(self._parse_dates([row[0] for row in conn.execute(query + " ORDER BY date", params)]))
+
+    def _coverage(self, ticker):
+        """(first_date, last_date, row_count, gap_runs) of ticker in stock_data, None if it has no rows"""
+        with self._db() as conn:
+            row = conn.execute("SELECT first_date, last_date, row_count, gap_runs FROM coverage WHERE ticker=?",
+                               (ticker,)).fetchone()
+            if row is None:
+                # Databases cached before the coverage index existed: index the ticker on first use
+                row = self._update_coverage(conn, ticker)
+        if row is None:
+            return None
+        first_date, last_date, row_count, gap_runs = row
+        return first_date, last_date, row_count, json.loads(gap_runs)
+
+    def _update_coverage(self, conn, ticker):
+        keys = [row[0] for row in conn.execute("SELECT date FROM stock_data WHERE ticker=? ORDER BY date", (ticker,))]
+        if not keys:
+            conn.execute("DELETE FROM coverage WHERE ticker=?", (ticker,))
+            return None
+        runs = _gap_runs(keys, self._key_days(keys), MIN_INDEXED_GAP_RUN)
+        row = (keys[0], keys[-1], len(keys), json.dumps(runs))
+        conn.execute("INSERT OR REPLACE INTO coverage VALUES(?,?,?,?,?)", (ticker,) + row)
+        return row
 
     def _get_nasdaq_symbols(self):
         """Get current NASDAQ-listed symbols"""
@@ -201,7 +757,7 @@ class DataLoader:
             'User-Agent': 'Mozilla/5.0',
             'Accept': 'application/json'
         }
-        response = requests.get(url, headers=headers)
+        response = (self.http or requests).get(url, headers=headers)
         data = response.json()
         return {item['symbol'] for item in data['data']['table']['rows']}
 
@@ -215,15 +771,62 @@ class DataLoader:
             'sortOrder': 'ASC',
             'maxResultsPerPage': 10000
         }
-        response = requests.post(url, json=params)
+        response = (self.http or requests).post(url, json=params)
         return {item['symbolTicker'] for item in response.json()}
 
-    def _check_ticker_data_quality(self, ticker):
-        """Returns (has_data, max_timespan) tuple"""
+    def _latest_symbol_snapshot(self):
+        """(fetched_at, symbols) of the latest symbol snapshot, None if there is none"""
+        with self._db() as conn:
+            row = conn.execute("SELECT fetched_at, symbols FROM symbol_snapshots ORDER BY id DESC LIMIT 1").fetchone()
+        return None if row is None else (datetime.fromisoformat(row[0]), set(json.loads(row[1])))
+
+    def _screened_tickers(self, max_age_hours=24):
+        """Tickers screened within the last max_age_hours"""
+        since = (datetime.now() - timedelta(hours=max_age_hours)).isoformat(timespec='seconds')
+        with self._db() as conn:
+            return {row[0] for row in conn.execute("SELECT ticker FROM screening WHERE screened_at > ?", (since,))}
+
+    def _screen_batch(self, tickers, warm_cache):
+        """Screens and stores one batch, returns how many tickers it covered"""
+        histories = self.source.download_batch(tickers)
+        rows = []
+        for ticker in tickers:
+            if ticker not in histories:
+                continue  # Download failed, screened again on the next run
+            hist = histories[ticker]
+            has_data, start_date, end_date = self._check_ticker_data_quality(ticker, hist)
+            if end_date is not None and start_date is not None:
+                duration_days = (pd.to_datetime(end_date) - pd.to_datetime(start_date)).days
+            else:
+                duration_days = None
+            rows.append((ticker, has_data, start_date, end_date, duration_days,
+                         datetime.now().isoformat(timespec='seconds')))
+
+            if has_data and warm_cache:
+                try:
+                    cached = self._cached_span(ticker)
+                    if cached is not None and self._adjustment_changed(ticker, cached[1] - pd.Timedelta(days=1), hist):
+                        # Screened again after a split or dividend, don't merge two adjustments
+                        self._delete_cached(ticker)
+                    self._cache_data(ticker, start_date, end_date, hist)
+                    self._record_download(ticker, hist.index[0], hist.index[-1] + pd.Timedelta(days=1))
+                except Exception as e:
+                    # fetch_data will try again (and fail the same way) when the ticker is backtested
+                    print(f"[WARNING] Not caching {ticker}: {e}")
+
+        with self._db() as conn:
+            conn.executemany("""INSERT OR REPLACE INTO screening
+                (ticker, has_data, start_date, end_date, duration_days, screened_at) VALUES(?,?,?,?,?,?)""", rows)
+        return len(tickers)
+
+    def _check_ticker_data_quality(self, ticker, hist=None):
+        """
+        Returns (has_data, max_timespan) tuple
+        hist: the ticker's full daily history if it was already downloaded
+        """
         try:
-            # Get metadata first (fast check)
-            ticker_obj = yf.Ticker(ticker)
-            hist = ticker_obj.history(period="max", interval="1d", prepost=False)
+            if hist is None:
+                hist = self.source.download(ticker)
 
             # Essential checks
             if hist.empty:
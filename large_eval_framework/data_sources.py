@@ -0,0 +1,156 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import quote
+
+import pandas as pd
+import yfinance as yf
+
+REQUIRED_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def empty_frame():
+    return pd.DataFrame(columns=REQUIRED_COLUMNS, index=pd.DatetimeIndex([]), dtype=float)
+
+
+class DataSource:
+    """
+    Where the DataLoader downloads OHLCV from. Subclasses implement _fetch, one request for a
+    list of tickers; the batching, retries and concurrency limit are shared:
+    batch_size: tickers per request in download_batch
+    max_concurrent: requests in flight at once, across all threads using this source
+    retries, backoff: a failing request is retried up to `retries` times after waiting
+        backoff, 2 * backoff, 4 * backoff, ... seconds
+    """
+
+    def __init__(self, batch_size=50, max_concurrent=2, retries=3, backoff=1.0):
+        self.batch_size = batch_size
+        self.max_concurrent = max_concurrent
+        self.retries = retries
+        self.backoff = backoff
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+    def download(self, ticker, start_date=None, end_date=None, interval='1d'):
+        """OHLCV of ticker from start_date up to (not including) end_date, None dates for its whole history"""
+        return self._fetch_with_retries([ticker], start_date, end_date, interval).get(ticker, empty_frame())
+
+    def download_batch(self, tickers, start_date=None, end_date=None, interval='1d') -> dict:
+        """
+        {ticker: OHLCV frame} for the same date range, fetched batch_size tickers per request.
+        Tickers the source has no data for get an empty frame, those whose request failed after
+        all retries are left out.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        batches = [tickers[i:i + self.batch_size] for i in range(0, len(tickers), self.batch_size)]
+
+        def fetch(batch):
+            try:
+                return self._fetch_with_retries(batch, start_date, end_date, interval)
+            except Exception as e:
+                print(f"[WARNING] Failed to download {len(batch)} tickers ({batch[0]}...): {e}")
+                return {}
+
+        frames = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrent) as executor:
+            for result in executor.map(fetch, batches):
+                frames.update(result)
+        return frames
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_slots']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+
+    # --- Private methods below ---
+
+    def _fetch(self, tickers, start_date, end_date, interval) -> dict:
+        raise NotImplementedError
+
+    def _fetch_with_retries(self, tickers, start_date, end_date, interval):
+        for attempt in range(self.retries + 1):
+            try:
+                with self._slots:
+                    return self._fetch(tickers, start_date, end_date, interval)
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                wait = self.backoff * 2 ** attempt
+                print(f"Download of {len(tickers)} tickers failed ({e}), retrying in {wait:.1f}s")
+                time.sleep(wait)
+
+
+class YFinanceSource(DataSource):
+    """
+    threads: passed to yf.download, which then fetches the tickers of a batch in parallel
+        (True, yfinance's default, or a number of threads). max_concurrent limits the batches.
+    """
+
+    def __init__(self, threads=True, **kwargs):
+        super().__init__(**kwargs)
+        self.threads = threads
+
+    # --- Private methods below ---
+
+    def _fetch(self, tickers, start_date, end_date, interval):
+        if start_date is None and end_date is None:
+            data = yf.download(tickers, period='max', interval=interval, progress=False, threads=self.threads)
+        else:
+            data = yf.download(tickers, start=start_date, end=end_date, interval=interval, progress=False,
+                               threads=self.threads)
+        if data.empty:
+            return {ticker: empty_frame() for ticker in tickers}
+
+        # Handle MultiIndex if present
+        if not isinstance(data.columns, pd.MultiIndex):
+            return {tickers[0]: data[REQUIRED_COLUMNS].copy()}
+        frames = {}
+        for ticker in tickers:
+            if ticker not in data.columns.get_level_values(1):
+                frames[ticker] = empty_frame()
+                continue
+            # A batch shares one index, drop the dates this ticker has no data for
+            frames[ticker] = data.xs(ticker, axis=1, level=1)[REQUIRED_COLUMNS].dropna(how='all').copy()
+        return frames
+
+
+class FileSource(DataSource):
+    """
+    Offline source reading <ticker>.csv files (Date index, Open/High/Low/Close/Volume) from a
+    directory, e.g. written with save(). Every request is appended to `requests` as
+    (tickers, start_date, end_date, interval), so tests can check what would be downloaded.
+    """
+
+    def __init__(self, path="price_files", **kwargs):
+        super().__init__(**kwargs)
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.requests = []
+
+    def save(self, ticker, data: pd.DataFrame):
+        data[REQUIRED_COLUMNS].to_csv(self._file(ticker), index_label='Date')
+
+    # --- Private methods below ---
+
+    def _file(self, ticker):
+        return self.path / f"{quote(str(ticker), safe='')}.csv"
+
+    def _fetch(self, tickers, start_date, end_date, interval):
+        self.requests.append((tuple(tickers), start_date, end_date, interval))
+        frames = {}
+        for ticker in tickers:
+            file = self._file(ticker)
+            if not file.exists():
+                frames[ticker] = empty_frame()
+                continue
+            data = pd.read_csv(file, index_col='Date', parse_dates=True, float_precision='round_trip')
+            if start_date is not None:
+                data = data[data.index >= pd.Timestamp(start_date)]
+            if end_date is not None:
+                data = data[data.index < pd.Timestamp(end_date)]
+            frames[ticker] = data
+        return frames
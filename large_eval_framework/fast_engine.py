@@ -0,0 +1,153 @@
+import sys
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+import pandas as pd
+import talib
+
+from . import strategy as strat
+from . import trade_tracker as tt
+from . import indicator_cache as ic
+
+_FULL_EQUITY = 1 - sys.float_info.epsilon  # backtesting.py's default buy() size
+
+
+@dataclass
+class FastResults:
+    equity: np.ndarray
+    trades: pd.DataFrame  # broker fills, same columns as backtesting's stats._trades subset
+    tracker_trades: List['tt.Trade'] = field(default_factory=list)
+
+    @property
+    def return_pct(self):
+        return (self.equity[-1] - self.equity[0]) / self.equity[0] * 100
+
+
+def run_darvas_fast(data: pd.DataFrame, params: dict, strategy_id="Default Params", trade_tracker=None,
+                    storage: 'strat.StrategyResults' = None, indicators=None,
+                    indicator_cache: 'ic.IndicatorCache' = None, ticker=None, atr=None,
+                    cash=10_000, commission=.002) -> FastResults:
+    """
+    Fast path for Backtest(data, DarvasJojo, commission=commission, exclusive_orders=True).run(**params).
+
+    Same entry rule (IN_BOX, volume multiplier, breakout of hb) and ATR trailing-stop exit,
+    simulated trade-to-trade over NumPy arrays instead of bar-by-bar. Fills happen at the next
+    bar's open with backtesting.py's sizing and commission, trade_tracker gets the same
+    open_trade/close_trade calls and storage gets the same arrays as DarvasJojo.finalize.
+    indicators and atr (ATR(14)) can be passed in precomputed, e.g. when sweeping parameters.
+    Supports the Backtest defaults used by the runner (no spread, margin 1, trade_on_close False).
+    """
+    volume_multiplier = params.get("volume_multiplier", strat.DarvasJojo.volume_multiplier)
+    lookback_period = params.get("lookback_period", strat.DarvasJojo.lookback_period)
+    box_period = params.get("box_period", strat.DarvasJojo.box_period)
+    volume_lookback = params.get("volume_lookback", strat.DarvasJojo.volume_lookback)
+    atr_factor = params.get("atr_factor", strat.DarvasJojo.atr_factor)
+    commission_fixed, commission_relative = commission if isinstance(commission, tuple) else (0, commission)
+
+    open_, high, low = data['Open'].to_numpy(), data['High'].to_numpy(), data['Low'].to_numpy()
+    close, volume = data['Close'].to_numpy(), data['Volume'].to_numpy()
+    index = data.index
+    n = len(data)
+
+    if indicators is None or len(indicators[0]) != n:
+        indicators = strat.darvas_boxes_batch(high, low, volume, [{"lookback_period": lookback_period,
+                                                                   "box_period": box_period,
+                                                                   "volume_lookback": volume_lookback}],
+                                              cache=indicator_cache, ticker=ticker)[0]
+    hb, lb, status, ma_vol = (np.asarray(a, dtype=np.float64) for a in indicators)
+    high_f, low_f, close_f = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    if atr is not None and len(atr) == n:
+        atr = np.asarray(atr, dtype=np.float64)
+    elif indicator_cache is not None:
+        atr_key = indicator_cache.key(ticker, "ATR", ic.data_fingerprint(high_f, low_f, close_f), (14,))
+        atr, = indicator_cache.get_or_compute(atr_key, talib.ATR, high_f, low_f, close_f, timeperiod=14)
+    else:
+        atr = talib.ATR(high_f, low_f, close_f, timeperiod=14)
+
+    # backtesting.py starts calling next() once every indicator is past its NaN warm-up
+    start = 1 + int(max(np.isnan(arr).argmin() for arr in (hb, lb, status, ma_vol, atr)))
+
+    # Entry signal on bar i looks at the box of bar i - 1
+    signal = np.zeros(n, dtype=bool)
+    with np.errstate(invalid='ignore'):
+        signal[1:] = ((status[:-1] == strat.STATE_MAP["IN_BOX"]) &
+                      (volume[1:] >= volume_multiplier * ma_vol[:-1]) &
+                      (high[1:] >= hb[:-1]))
+    signal[:start] = False
+    signal_bars = np.flatnonzero(signal)
+
+    stop_val_arr = np.full(n, 0, dtype=np.float64)
+    equity = np.full(n, np.nan)
+    fills = []
+    tracker_trades = []
+    tracker_open = None
+    stop_price = None
+    i = start
+    while i < n:
+        # Flat: the next signal places a market buy, filled at the following open
+        j = np.searchsorted(signal_bars, i)
+        if j == len(signal_bars):
+            equity[i:] = cash
+            break
+        entry_signal = signal_bars[j]
+        equity[i:entry_signal + 1] = cash
+        if tracker_open is None:
+            tracker_open = tt.Trade(strategy_id, index[entry_signal], open_[entry_signal])
+        stop_price = (hb[entry_signal - 1] + lb[entry_signal - 1]) / 2
+        entry_bar = entry_signal + 1
+        if entry_bar >= n:
+            break
+
+        price = open_[entry_bar]
+        price_plus_commission = price + (commission_fixed + _FULL_EQUITY * price * commission_relative) / _FULL_EQUITY
+        size = int((cash * _FULL_EQUITY) // price_plus_commission)
+        if not size or size * price_plus_commission > cash:
+            # The broker cancels the order; still flat on the fill bar
+            i = entry_bar
+            continue
+        entry_commission = commission_fixed + size * price * commission_relative
+        cash -= entry_commission
+
+        # In position from the fill bar: exit on the first close below the trailing stop, or the last bar
+        stop_vals = np.fmax(stop_price, high_f[entry_bar:] - atr_factor * atr[entry_bar:])
+        exit_hits = close[entry_bar:] < stop_vals
+        exit_hits[-1] = True
+        exit_signal = entry_bar + int(np.argmax(exit_hits))
+        stop_val_arr[entry_bar:exit_signal + 1] = stop_vals[:exit_signal - entry_bar + 1]
+        equity[entry_bar:exit_signal + 1] = cash + (close[entry_bar:exit_signal + 1] * size - size * price)
+        if tracker_open is not None:
+            tracker_open.close(index[exit_signal], close[exit_signal])
+            tracker_trades.append(tracker_open)
+            tracker_open = None
+
+        exit_bar = exit_signal + 1
+        if exit_bar >= n:
+            break
+        exit_price = open_[exit_bar]
+        exit_commission = commission_fixed + size * exit_price * commission_relative
+        cash += size * (exit_price - price) - exit_commission
+        fills.append((size, entry_bar, exit_bar, price, exit_price,
+                      size * (exit_price - price) - (exit_commission + entry_commission),
+                      exit_commission + entry_commission, index[entry_bar], index[exit_bar]))
+        i = exit_bar
+
+    equity = pd.Series(equity).bfill().fillna(cash).to_numpy()
+    trades = pd.DataFrame(fills, columns=['Size', 'EntryBar', 'ExitBar', 'EntryPrice', 'ExitPrice',
+                                          'PnL', 'Commission', 'EntryTime', 'ExitTime'])
+
+    if trade_tracker is not None:
+        for trade in tracker_trades:
+            trade_tracker.open_trade(trade.strategy_id, trade.entry_time, trade.entry_price)
+            trade_tracker.close_trade(trade.exit_time, trade.exit_price)
+        if tracker_open is not None:
+            trade_tracker.open_trade(tracker_open.strategy_id, tracker_open.entry_time, tracker_open.entry_price)
+
+    if storage and start < n:
+        storage.date = index
+        storage.high_bounds = hb
+        storage.low_bounds = lb
+        storage.box_status = status
+        storage.stop_values = stop_val_arr
+
+    return FastResults(equity=equity, trades=trades, tracker_trades=tracker_trades)
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+# The directory is sized up again after writing this fraction of max_bytes, or when the entries
+# known to this process exceed max_bytes. Eviction then goes down to EVICT_TO of max_bytes.
+RESCAN_FRACTION = 1 / 64
+EVICT_TO = 0.9
+
+
+def data_fingerprint(*arrays) -> str:
+    """Content hash of the input arrays (values and dtypes)"""
+    digest = hashlib.sha1()
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        digest.update(arr.dtype.str.encode())
+        digest.update(arr.tobytes())
+    return digest.hexdigest()
+
+
+class IndicatorCache:
+    """
+    On-disk cache of indicator arrays as compressed .npz files.
+    Entries are keyed by ticker, indicator name, data fingerprint and parameters,
+    and evicted least-recently-used once the directory grows past max_bytes.
+    Several processes (e.g. runner pool workers) can share a directory: recency is the files'
+    mtime and eviction sizes up the directory itself, so max_bytes holds for all of them together
+    (up to RESCAN_FRACTION * max_bytes per process in between).
+    """
+
+    def __init__(self, path="indicator_cache", max_bytes=512 * 1024 ** 2):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._index = OrderedDict()  # key -> file size, least recently used first
+        self._written = 0  # bytes put since the directory was last scanned
+        self._scan()
+
+    def key(self, ticker, name, fingerprint, params) -> str:
+        param_hash = hashlib.sha1(repr(tuple(params)).encode()).hexdigest()[:12]
+        safe_ticker = re.sub(r"[^A-Za-z0-9_-]", "_", str(ticker or "unknown"))
+        return f"{safe_ticker}_{name}_{fingerprint[:16]}_{param_hash}"
+
+    def get(self, key):
+        """Returns the cached tuple of arrays, or None on a miss"""
+        file = self.path / f"{key}.npz"
+        try:
+            with np.load(file) as npz:
+                arrays = tuple(npz[f"arr_{i}"] for i in range(len(npz.files)))
+            # Marks it recently used for every process sharing the directory
+            os.utime(file)
+            size = file.stat().st_size
+        except (OSError, ValueError, KeyError):
+            # Missing, unreadable or evicted by another process meanwhile
+            self._index.pop(key, None)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._index[key] = size
+        self._index.move_to_end(key)
+        return arrays
+
+    def put(self, key, arrays):
+        file = self.path / f"{key}.npz"
+        tmp_file = self.path / f"{key}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            np.savez_compressed(f, *[np.asarray(a) for a in arrays])
+            size = f.tell()
+        os.replace(tmp_file, file)
+        self._index[key] = size
+        self._index.move_to_end(key)
+        self._written += size
+        self._evict()
+
+    def get_or_compute(self, key, func, *args, **kwargs):
+        """Returns func(*args, **kwargs) as a tuple of arrays, from cache when possible"""
+        arrays = self.get(key)
+        if arrays is None:
+            arrays = func(*args, **kwargs)
+            if not isinstance(arrays, tuple):
+                arrays = (arrays,)
+            self.put(key, arrays)
+        return arrays
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._index), "bytes": sum(self._index.values())}
+
+    def clear(self):
+        self._scan()
+        for key in list(self._index):
+            (self.path / f"{key}.npz").unlink(missing_ok=True)
+        self._index.clear()
+
+    # --- Private methods below ---
+
+    def _scan(self):
+        """Rebuild the index from the directory, which other processes may have written to or evicted from"""
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".npz"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, entry.name[:-len(".npz")], stat.st_size))
+        self._index = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._written = 0
+
+    def _evict(self):
+        total = sum(self._index.values())
+        if self._written < self.max_bytes * RESCAN_FRACTION and total <= self.max_bytes:
+            return
+        self._scan()
+        total = sum(self._index.values())
+        if total <= self.max_bytes:
+            return
+        while total > self.max_bytes * EVICT_TO and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            (self.path / f"{key}.npz").unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
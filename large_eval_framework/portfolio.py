@@ -0,0 +1,132 @@
+import json
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+SIZINGS = ("equity", "fixed")
+
+
+@dataclass
+class PortfolioResults:
+    equity: pd.Series  # realized equity (cash + open positions at cost) at the end of each day
+    invested: pd.Series  # capital in open positions at the end of each day
+    trades: pd.DataFrame  # the trades taken, with the allocation and net pnl in currency
+    skipped: int  # entries dropped because max_positions were open or no cash was left
+
+    @property
+    def return_pct(self):
+        return (self.equity.iloc[-1] - self.equity.iloc[0]) / self.equity.iloc[0] * 100
+
+    @property
+    def max_drawdown_pct(self):
+        return float(((self.equity / self.equity.cummax() - 1) * 100).min())
+
+
+def load_trades(db_path="trades.db", strategy_id=None, sweep_id=None, backtest_ids=None) -> pd.DataFrame:
+    """Trades of trades.db (all, or filtered by strategy, sweep or backtests) with ticker and strategy_id, by trade id"""
+    filters, params = [], []
+    for column, value in (("b.strategy_id", strategy_id), ("b.sweep_id", sweep_id)):
+        if value is not None:
+            filters.append(f"{column} = ?")
+            params.append(value)
+    if backtest_ids is not None:
+        filters.append("b.id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps([int(i) for i in backtest_ids]))
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+    with closing(sqlite3.connect(db_path)) as conn:
+        trades = pd.read_sql_query(f"""
+            SELECT t.id AS trade_id, t.backtest_id, b.strategy_id, b.ticker, t.entry_time, t.exit_time,
+                   t.entry_price, t.exit_price, t.pnl, t.duration
+            FROM trades t JOIN backtests b ON b.id = t.backtest_id
+            {where}
+            ORDER BY t.id
+        """, conn, params=params)
+    for column in ('entry_time', 'exit_time'):
+        trades[column] = pd.to_datetime(trades[column], format='ISO8601')
+    return trades
+
+
+def simulate_portfolio(trades: pd.DataFrame, initial_capital=100_000, max_positions=10, sizing="equity",
+                       commission=.002, rank_by=None) -> PortfolioResults:
+    """
+    Trade every ticker's signals from one account: entries and exits of `trades` (e.g. load_trades
+    of one strategy) are replayed chronologically and an entry is only taken while fewer than
+    max_positions are open and cash is left.
+    sizing: "equity" puts realized equity / max_positions into each new position (compounding),
+        "fixed" always initial_capital / max_positions; both capped by the cash available
+    commission: relative, paid on entry and exit like Backtest(commission=...)
+    rank_by: column of trades, entries at the same time are taken highest first (default: in row order)
+
+    Exits at a time are processed before entries, so a closing position frees its slot for them.
+    Only the admission of entries runs event by event; returns, the equity curve and exposure are
+    computed over arrays.
+    """
+    if sizing not in SIZINGS:
+        raise ValueError(f"sizing must be one of {SIZINGS}, got {sizing!r}")
+    n = len(trades)
+    entry_time = pd.DatetimeIndex(trades['entry_time']).as_unit('ns').asi8
+    exit_time = pd.DatetimeIndex(trades['exit_time']).as_unit('ns').asi8
+    # Net return of the capital put into a trade, commissions included
+    returns = (trades['exit_price'].to_numpy(dtype=np.float64) / trades['entry_price'].to_numpy(dtype=np.float64)
+               * (1 - commission) / (1 + commission) - 1)
+
+    # Events sorted by time; at equal times exits (kind 0) go first, then entries by rank (kind 1),
+    # then exits of trades that entered at that same time (kind 2)
+    rank = np.zeros(n) if rank_by is None else -trades[rank_by].to_numpy(dtype=np.float64)
+    times = np.concatenate([exit_time, entry_time])
+    kinds = np.concatenate([np.where(exit_time > entry_time, 0, 2), np.ones(n, dtype=np.int64)])
+    ranks = np.concatenate([np.zeros(n), rank])
+    trade_index = np.tile(np.arange(n), 2)
+    order = np.lexsort((trade_index, ranks, kinds, times))
+    events = (trade_index[order] * 2 + (kinds[order] == 1)).tolist()  # trade * 2 + 1 for entries
+
+    allocation = [0.0] * n
+    returns_list = returns.tolist()
+    cash = equity = float(initial_capital)
+    fixed = sizing == "fixed"
+    slot = equity / max_positions
+    open_positions = skipped = 0
+    for event in events:
+        i = event >> 1
+        if event & 1:
+            if open_positions == max_positions or cash <= 0:
+                skipped += 1
+                continue
+            amount = slot if fixed else equity / max_positions
+            if amount > cash:
+                amount = cash
+            allocation[i] = amount
+            cash -= amount
+            open_positions += 1
+        elif allocation[i]:
+            profit = allocation[i] * returns_list[i]
+            cash += allocation[i] + profit
+            equity += profit
+            open_positions -= 1
+
+    allocation = np.array(allocation)
+    taken = allocation > 0
+    profit = allocation * returns
+
+    # Realized equity and invested capital at the end of each day
+    first, last = pd.Timestamp(entry_time.min() if n else 0), pd.Timestamp(exit_time.max() if n else 0)
+    days = pd.date_range(first.normalize(), last.normalize(), freq='D')
+    day_ends = (days + pd.Timedelta(days=1)).as_unit('ns').asi8 - 1
+    exit_order = np.argsort(exit_time[taken], kind='stable')
+    realized = np.concatenate([[0.0], np.cumsum(profit[taken][exit_order])])
+    equity_curve = initial_capital + realized[np.searchsorted(exit_time[taken][exit_order], day_ends, 'right')]
+    flows = np.concatenate([allocation[taken], -allocation[taken]])
+    flow_times = np.concatenate([entry_time[taken], exit_time[taken]])
+    flow_order = np.argsort(flow_times, kind='stable')
+    invested = np.concatenate([[0.0], np.cumsum(flows[flow_order])])
+    invested_curve = invested[np.searchsorted(flow_times[flow_order], day_ends, 'right')]
+
+    taken_trades = trades[taken].copy()
+    taken_trades['allocation'] = allocation[taken]
+    taken_trades['net_pnl'] = profit[taken]
+    return PortfolioResults(equity=pd.Series(equity_curve, index=days, name='equity'),
+                            invested=pd.Series(invested_curve, index=days, name='invested'),
+                            trades=taken_trades, skipped=skipped)
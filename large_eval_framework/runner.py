@@ -1,48 +1,251 @@
+import itertools
+import multiprocessing as mp
+import signal
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+
 import pandas as pd
 from . import trade_tracker as tt
 from . import data_loader as dl
 from . import strategy as strat
 from backtesting import Backtest
 from . import config
+from . import indicator_cache as ic
+from . import fast_engine as fe
 
+_worker = {}  # per-process loader, indicator cache and engine, set by _init_worker
 
-def run_strategy_on_tickers(csv_path = "good_tickers.csv", start_index = 0, run_again = True):
-    tracker = tt.TradeTracker()
-    loader = dl.DataLoader()
+# Rough single-core seconds per backtest (fetch from cache + backtest), only used for the up-front ETA
+EST_SECONDS_PER_BACKTEST = {"backtesting": 0.5, "fast": 0.05}
 
-    #symbols = loader.get_all_symbols()
-    #loader.filter_good_tickers(symbols)
 
-    tickers_and_timespan = pd.read_csv(csv_path)
+@dataclass
+class RunPlan:
+    tasks: list = field(default_factory=list)  # (index, ticker, start_date, end_date, [(strategy_id, params)])
+    already_ran: int = 0
+    too_short: int = 0
+    duplicates: int = 0
+
+    @property
+    def n_backtests(self):
+        return sum(len(task[4]) for task in self.tasks)
 
+    def report(self, engine="backtesting", workers=1):
+        eta = timedelta(seconds=round(self.n_backtests * EST_SECONDS_PER_BACKTEST.get(engine, 0.5) / max(1, workers)))
+        print(f"Run plan: {len(self.tasks)} tickers, {self.n_backtests} backtests, "
+              f"{self.already_ran} combos already ran, {self.too_short} tickers too short, "
+              f"{self.duplicates} duplicate tickers; estimated time {eta}")
+
+
+def plan_run(tickers_and_timespan: pd.DataFrame, conf: dict, processed: set, start_index = 0, run_again = True,
+             min_duration_days = 300, interval = '1d') -> RunPlan:
+    """
+    Build the whole (ticker x strategy) work list, grouped by ticker so each ticker's data is loaded once.
+    Backtests on other intervals than daily get "@<interval>" appended to their strategy id.
+    """
+    plan = RunPlan()
+    seen = set()
     for index, row in tickers_and_timespan.iloc[start_index:].iterrows():
         ticker = row['ticker']
-        start_date = row['start_date']
-        end_date = row['end_date']
-        if row['duration_days'] < 300:
+        if row['duration_days'] < min_duration_days:
+            plan.too_short += 1
             continue
+        if ticker in seen:
+            plan.duplicates += 1
+            continue
+        seen.add(ticker)
+
+        strategies = []
+        for conf_id in conf.keys():
+            strategy_id = _strategy_id(conf_id, interval)
+            if (strategy_id, ticker) in processed:
+                plan.already_ran += 1
+                if not run_again:
+                    continue
+            strategies.append((strategy_id, conf[conf_id]))
+        if strategies:
+            plan.tasks.append((index, ticker, row['start_date'], row['end_date'], strategies))
+    return plan
 
-        print(f"Processing {ticker} from {start_date} to {end_date}, ticker number is {index}")
 
+def _strategy_id(conf_id, interval):
+    return conf_id if interval == '1d' else f"{conf_id}@{interval}"
 
-        conf = config.load_strategy_params("darvas_config.json")
-        for strategy_id in conf.keys():
 
-            if tracker.check_if_already_ran(strategy_id, ticker):
-                print(f"combo of strategy {strategy_id} and ticker {ticker} already ran")
-                if not run_again:
-                    continue
+def prefetch_data(loader, tasks, depth = 4, interval = '1d'):
+    """
+    Yields (task, data) in task order while the next `depth` tasks are fetched by background
+    threads, so at most depth + 1 fetched datasets are held at once. depth=0 fetches inline.
+    """
+    if depth < 1:
+        for task in tasks:
+            yield task, _fetch(loader, task, interval)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=depth, thread_name_prefix="prefetch")
+    try:
+        task_iter = iter(tasks)
+        pending = deque((task, executor.submit(_fetch, loader, task, interval))
+                        for task in itertools.islice(task_iter, depth))
+        while pending:
+            task, future = pending.popleft()
+            next_task = next(task_iter, None)
+            if next_task is not None:
+                pending.append((next_task, executor.submit(_fetch, loader, next_task, interval)))
+            yield task, future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def cache_in_chunks(loader: 'dl.DataLoader', tasks, chunk_size=None):
+    """
+    Yields tasks, downloading what the cache is missing for each chunk_size of them (default: the
+    source's batch_size) in batched requests when the stream reaches them. A cold cache is then
+    filled while the first chunks are backtested, instead of before any backtest starts.
+    """
+    chunk_size = chunk_size or loader.source.batch_size
+    for i in range(0, len(tasks), chunk_size):
+        chunk = tasks[i:i + chunk_size]
+        loader.cache_tickers((task[1], task[2], task[3]) for task in chunk)
+        yield from chunk
+
+
+def run_strategy_on_tickers(csv_path = "good_tickers.csv", start_index = 0, run_again = True,
+                            indicator_cache_dir = "indicator_cache", engine = "backtesting", workers = 1,
+                            prefetch_depth = 4, loader = None, interval = '1d', store_results = False,
+                            verbose = False):
+    """
+    engine: "backtesting" runs backtesting.py, "fast" the equivalent fast_engine.run_darvas_fast
+    workers: > 1 fetches and backtests tickers in that many processes. This process stays the
+        only writer of trades.db and stores results in ticker order. Backtests are committed in
+        batches and on exit (also on Ctrl-C), so a rerun with run_again=False resumes.
+    prefetch_depth: with workers=1, how many upcoming tickers are fetched in background threads
+        while the current one is backtested
+    loader: anything with DataLoader's fetch_data(ticker, start_date, end_date), defaults to DataLoader().
+        Needs fetch_data's interval argument for other intervals than '1d'.
+    interval: bar size to backtest on, e.g. '1wk' (resampled from the cached daily bars)
+    store_results: keep each backtest's StrategyResults (box bounds, status, stops) and its boxes in
+        trades.db, so visualization.plot_trade can draw its trades without rerunning the backtest
+        and strategy.query_boxes can search boxes across tickers
+    verbose: print every backtest's trades
+    """
+    tracker = tt.TradeTracker(flush_every=tt.BATCH_FLUSH_EVERY, compact=True)
 
-            #fetch data
-            data = loader.fetch_data(ticker, start_date, end_date)
-            if data is None or data.empty:
+    #symbols = loader.get_all_symbols()
+    #loader.filter_good_tickers(symbols)
+
+    tickers_and_timespan = pd.read_csv(csv_path)
+    conf = config.load_strategy_params("darvas_config.json")
+    strategy_ids = [_strategy_id(conf_id, interval) for conf_id in conf]
+    plan = plan_run(tickers_and_timespan, conf, tracker.get_processed_pairs(strategy_ids), start_index, run_again,
+                    interval=interval)
+    plan.report(engine, workers)
+    tasks = plan.tasks
+
+    loader = loader or dl.DataLoader()
+    task_stream = tasks
+    if isinstance(loader, dl.DataLoader) and interval in ('1d',) + dl.RESAMPLED_INTERVALS:
+        # The backtests then read the cache
+        task_stream = cache_in_chunks(loader, tasks)
+    pool = None
+    fetched = None
+    if workers > 1:
+        pool = mp.Pool(workers, initializer=_init_worker, initargs=(indicator_cache_dir, engine, loader, interval, True,
+                                                                     store_results))
+        results = pool.imap(_run_ticker, task_stream)
+    else:
+        _init_worker(indicator_cache_dir, engine, loader, interval, store_results=store_results)
+        fetched = prefetch_data(loader, task_stream, prefetch_depth, interval)
+        results = (_backtest_ticker(task, data) for task, data in fetched)
+
+    started = time.perf_counter()
+    try:
+        for done, ((index, ticker, start_date, end_date, _), backtests) in enumerate(results, 1):
+            if backtests is None:
                 print(f"[SKIP] No data for {ticker} from {start_date} to {end_date}, skipping.")
                 continue
-            print(f"Current strategy: {strategy_id}, ticker: {ticker}")
-            tracker.start_tracking(strategy_id, ticker, start_date, end_date, conf[strategy_id])
+            for strategy_id, params, trades, encoded, boxes in backtests:
+                tracker.start_tracking(strategy_id, ticker, start_date, end_date, params)
+                tracker.record_trades(trades)
+                if verbose:
+                    tracker.show()
+                tracker.finalize_backtest_to_db(encoded, boxes)
+
+            elapsed = time.perf_counter() - started
+            eta = timedelta(seconds=round(elapsed / done * (len(tasks) - done)))
+            print(f"total trades made so far: {tracker.get_total_trades_made()}, "
+                  f"{done}/{len(tasks)} tickers done, ETA {eta}")
+    except KeyboardInterrupt:
+        print("Interrupted. Finished backtests are committed, rerun with run_again=False to resume.")
+    finally:
+        tracker.flush()
+        if fetched is not None:
+            fetched.close()
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    if pool is None and _worker['cache'] is not None:
+        print(f"indicator cache: {_worker['cache'].stats()}")
+
+
+def _init_worker(indicator_cache_dir, engine, loader, interval='1d', ignore_sigint=False, store_results=False):
+    if ignore_sigint:
+        # Ctrl-C is handled by the writer process, which terminates the pool
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker['loader'] = loader
+    _worker['cache'] = ic.IndicatorCache(indicator_cache_dir) if indicator_cache_dir else None
+    _worker['engine'] = engine
+    _worker['interval'] = interval
+    _worker['store_results'] = store_results
+
+
+def _run_ticker(task):
+    """Fetch one ticker and backtest its strategies, runs inside pool workers"""
+    #fetch data once, every strategy config of this ticker shares it
+    data = _fetch(_worker['loader'], task, _worker['interval'])
+    return _backtest_ticker(task, data)
+
+
+def _fetch(loader, task, interval):
+    if interval == '1d':
+        return loader.fetch_data(task[1], task[2], task[3])
+    return loader.fetch_data(task[1], task[2], task[3], interval)
+
+
+def _backtest_ticker(task, data):
+    """
+    Backtest a ticker's strategies on its data, returns (task, [(strategy_id, params, TradeBuffer,
+    encoded StrategyResults, box rows)]) or (task, None), the last two None without store_results
+    """
+    index, ticker, start_date, end_date, strategies = task
+    cache, engine = _worker['cache'], _worker['engine']
+    print(f"Processing {ticker} from {start_date} to {end_date}, ticker number is {index}")
+
+    if data is None or data.empty:
+        return task, None
+    indicators = strat.darvas_boxes_batch(data['High'].to_numpy(), data['Low'].to_numpy(),
+                                          data['Volume'].to_numpy(), [params for _, params in strategies],
+                                          cache=cache, ticker=ticker)
+
+    recorder = tt.TradeTracker(json_file=None, db_path=":memory:", compact=True)
+    backtests = []
+    for (strategy_id, params), darvas_indicators in zip(strategies, indicators):
+        print(f"Current strategy: {strategy_id}, ticker: {ticker}")
+        recorder.start_tracking(strategy_id, ticker, start_date, end_date, params)
+        storage = strat.StrategyResults() if _worker['store_results'] else None
+        if engine == "fast":
+            fe.run_darvas_fast(data, params, strategy_id = strategy_id, trade_tracker = recorder, storage = storage,
+                               indicators = darvas_indicators, indicator_cache = cache, ticker = ticker)
+        else:
             bt = Backtest(data, strat.DarvasJojo, commission=.002, exclusive_orders=True)
-            bt.run(**conf[strategy_id], trade_tracker = tracker, strategy_id = strategy_id)
-            tracker.show()
-            tracker.finalize_backtest_to_db()
-            
-        print(f"total trades made so far: {tracker.get_total_trades_made()}")
+            bt.run(**params, trade_tracker = recorder, strategy_id = strategy_id, storage = storage,
+                   indicators = darvas_indicators, indicator_cache = cache, ticker = ticker)
+        # Compressed here so only the blobs travel back from pool workers
+        stored = storage is not None and storage.date is not None
+        backtests.append((strategy_id, params, recorder.trade_buffer.copy(),
+                          storage.encode() if stored else None, storage.box_rows() if stored else None))
+    return task, backtests
@@ -1,10 +1,17 @@
+import io
+import sqlite3
+import zlib
+from contextlib import closing
+
 from backtesting import Backtest, Strategy
 import matplotlib.pyplot as plt
 from backtesting.lib import crossover
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pandas as pd
 import talib
 from . import trade_tracker
+from . import indicator_cache as ic
 
 from datetime import timedelta
 from bokeh.plotting import figure, show
@@ -29,59 +36,284 @@ class StrategyResults:
         self.box_status = None
         self.stop_values = None
 
+    def encode(self):
+        """
+        The arrays as zlib-compressed .npy blobs in RESULT_COLUMNS order, as stored in the
+        strategy_results table, or None if the backtest never filled them
+        """
+        if self.date is None:
+            return None
+        arrays = (pd.DatetimeIndex(self.date).as_unit('ns').asi8, np.asarray(self.high_bounds, dtype=np.float64),
+                  np.asarray(self.low_bounds, dtype=np.float64), np.asarray(self.box_status).astype(np.int8),
+                  np.asarray(self.stop_values, dtype=np.float64))
+        blobs = []
+        for array in arrays:
+            buffer = io.BytesIO()
+            np.save(buffer, array, allow_pickle=False)
+            blobs.append(zlib.compress(buffer.getvalue()))
+        return tuple(blobs)
+
+    @classmethod
+    def decode(cls, blobs) -> 'StrategyResults':
+        results = cls()
+        dates, *arrays = (np.load(io.BytesIO(zlib.decompress(blob)), allow_pickle=False) for blob in blobs)
+        results.date = pd.DatetimeIndex(dates.view('datetime64[ns]'))
+        results.high_bounds, results.low_bounds, results.box_status, results.stop_values = arrays
+        return results
+
+    def box_rows(self) -> list:
+        """(start_date, end_date, high, low, outcome) of each completed box, as stored in the boxes table"""
+        boxes = box_frame(self)
+        return list(zip(_isoformat(boxes['start_date']), _isoformat(boxes['end_date']),
+                        boxes['high_val'].tolist(), boxes['low_val'].tolist(), boxes['outcome'].tolist()))
+
+    def slice(self, start_date=None, end_date=None) -> 'StrategyResults':
+        """The bars between start_date and end_date (inclusive)"""
+        lo = 0 if start_date is None else self.date.searchsorted(pd.Timestamp(start_date), 'left')
+        hi = len(self.date) if end_date is None else self.date.searchsorted(pd.Timestamp(end_date), 'right')
+        results = StrategyResults()
+        results.date = self.date[lo:hi]
+        for name in RESULT_COLUMNS[1:]:
+            setattr(results, name, getattr(self, name)[lo:hi])
+        return results
+
+
+def _isoformat(dates) -> list:
+    # Same strings as Timestamp.isoformat() for whole-second times, like the trades table
+    return np.datetime_as_string(pd.DatetimeIndex(dates).as_unit('s').to_numpy()).tolist()
+
+
+# Columns of the strategy_results table in trades.db, next to its backtest_id key
+RESULT_COLUMNS = ("date", "high_bounds", "low_bounds", "box_status", "stop_values")
+
+
+def load_strategy_results(backtest_id, db_path="trades.db", start_date=None, end_date=None):
+    """
+    StrategyResults stored for a backtest (see TradeTracker.finalize_backtest_to_db), limited to
+    start_date..end_date, or None if none were stored
+    """
+    try:
+        with closing(sqlite3.connect(db_path)) as conn:
+            row = conn.execute(f"SELECT {', '.join(RESULT_COLUMNS)} FROM strategy_results WHERE backtest_id = ?",
+                               (int(backtest_id),)).fetchone()
+    except sqlite3.OperationalError:  # databases written before results were stored, or none at all
+        row = None
+    if row is None:
+        return None
+    return StrategyResults.decode(row).slice(start_date, end_date)
+
 REVERSE_STATE_MAP ={v:k for k,v in STATE_MAP.items() }
 
-def darvas_boxes(high, low, volume, lookback_period=252, box_period=3,
-                 volume_lookback=20):
+def _rolling_max(values, window):
+    """Trailing max over `window` values (van Herk/Gil-Werman, O(n)).
+
+    out[i] == max(values[i - window + 1:i + 1]) for i >= window - 1, NaN before that.
+    NaN values are handled like the builtin max does: skipped, unless one is the first value
+    of the window, which makes the result NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    out = np.full(n, np.nan)
+    if window <= 0 or n < window:
+        return out
+    n_blocks = -(-n // window)
+    padded = np.full(n_blocks * window, -np.inf)
+    padded[:n] = values
+    blocks = padded.reshape(n_blocks, window)
+    prefix = np.fmax.accumulate(blocks, axis=1).ravel()
+    suffix = np.fmax.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    out[window - 1:] = np.fmax(suffix[:n - window + 1], prefix[window - 1:n])
+    out[window - 1:][np.isnan(values[:n - window + 1])] = np.nan
+    return out
+
+
+def _rolling_mean(values, window):
+    """Trailing mean over `window` values, NaN before the first full window.
+
+    Integral volumes go through an exact integer cumulative sum; anything else falls back
+    to a strided window mean so the result stays bit-identical to np.mean per slice.
+    """
+    values = np.asarray(values)
+    n = len(values)
+    out = np.full(n, np.nan)
+    if window <= 0 or n < window:
+        return out
+    if values.dtype.kind in "iu" or np.array_equal(values, np.trunc(values)):
+        csum = np.concatenate(([0], np.cumsum(values.astype(np.int64))))
+        out[window - 1:] = (csum[window:] - csum[:-window]) / window
+    else:
+        out[window - 1:] = sliding_window_view(values.astype(np.float64), window).mean(axis=1)
+    return out
+
+
+def _box_state_machine(high, low, is_new_high, first_bar, box_period, start=None):
+    """Run the Darvas state machine over precomputed new-high flags, from index first_bar on.
+
+    start is a carried (state, high_bound, low_bound, remaining_day_forming) tuple; a fresh
+    NO_BOX state is used when omitted.
+    Returns (high_bounds, low_bounds, numeric_status, end) with end in the same form as start.
+    """
+    no_box, new_box, forming = STATE_MAP["NO_BOX"], STATE_MAP["NEW_BOX"], STATE_MAP["BOX_FORMING"]
+    in_box, canceled = STATE_MAP["IN_BOX"], STATE_MAP["BOX_CANCELED"]
+
     high_bounds = np.full_like(high, 0)
     low_bounds = np.full_like(low, 0)
-    ma_volume = np.full_like(volume, 0)
-    box_status = np.full(len(volume), "NO_BOX", dtype = '<U20')
-    remaining_day_forming = box_period
-    high_dbg = 0
-    low_dbg = 0
-    state_dbg = "NO_BOX"
-    for i in range(volume_lookback - 1, len(volume)):
-        ma_volume[i] = np.mean(volume[i - volume_lookback + 1: i + 1])
-
-    for i in range(lookback_period, len(high)):
-        box_status[i] = box_status[i - 1]
-        high_bounds[i] = high_bounds[i - 1]
-        low_bounds[i] = low_bounds[i - 1]
-        upward_days = 0
-        high_dbg = high[i]
-        low_dbg = low[i]
-        state_dbg = box_status[i]
-
-        if high[i] == max(high[i - lookback_period:i + 1]):
-            high_bounds[i] = high[i]
-            low_bounds[i] = low[i]
+    hi, lo, new_high = np.asarray(high).tolist(), np.asarray(low).tolist(), is_new_high.tolist()
+    hb_out, lb_out = high_bounds.tolist(), low_bounds.tolist()
+    status_out = [no_box] * len(hi)
+
+    state, hb, lb, remaining_day_forming = start if start is not None else (no_box, 0, 0, box_period)
+    for i in range(first_bar, len(hi)):
+        if new_high[i]:
+            hb, lb = hi[i], lo[i]
             remaining_day_forming = box_period
-            box_status[i] = "NEW_BOX"
-            continue
-
-        if box_status[i] == "BOX_FORMING" or  box_status[i] == "NEW_BOX":
-            if low_bounds[i] > low[i]:
-                low_bounds[i] = low[i]
+            state = new_box
+        elif state == forming or state == new_box:
+            if lb > lo[i]:
+                lb = lo[i]
                 remaining_day_forming = box_period
             else:
                 remaining_day_forming -= 1
+            state = forming if remaining_day_forming > 0 else in_box
+        elif state == in_box:
+            if lo[i] < lb:
+                state = canceled
+        elif state == canceled:
+            state = no_box
+            hb, lb = 0, 0
+        hb_out[i], lb_out[i], status_out[i] = hb, lb, state
 
-            box_status[i] = "BOX_FORMING" if remaining_day_forming > 0 else "IN_BOX"
-            continue
+    high_bounds[:] = hb_out
+    low_bounds[:] = lb_out
+    return high_bounds, low_bounds, np.array(status_out, dtype=np.int64), (state, hb, lb, remaining_day_forming)
 
-        if box_status[i] == "IN_BOX":
-            box_status[i] = "BOX_CANCELED" if low[i] < low_bounds[i] else "IN_BOX"
-            continue
 
-        if box_status[i] == "BOX_CANCELED":
-            box_status[i] = "NO_BOX"
-            high_bounds[i] = 0
-            low_bounds[i] = 0
-
-    numeric_status = np.array([STATE_MAP[s] for s in box_status])
+def darvas_boxes(high, low, volume, lookback_period=252, box_period=3,
+                 volume_lookback=20):
+    """Darvas box bounds, numeric box status and volume moving average per bar.
+
+    Rolling max and volume average are computed in O(n); only the state machine
+    itself walks the bars.
+    """
+    params = {"lookback_period": lookback_period, "box_period": box_period, "volume_lookback": volume_lookback}
+    return darvas_boxes_batch(high, low, volume, [params])[0]
+
+
+def darvas_boxes_batch(high, low, volume, param_sets, cache: 'ic.IndicatorCache' = None, ticker=None):
+    """darvas_boxes for several parameter sets over one ticker's arrays.
+
+    param_sets is a list of parameter dicts (e.g. the values of darvas_config.json); keys
+    other than lookback_period, box_period and volume_lookback are ignored. Rolling highs
+    are shared per lookback_period, volume averages per volume_lookback and the box state
+    per (lookback_period, box_period). With a cache, stored results are reused and new
+    ones written back.
+    Returns a list of (high_bounds, low_bounds, numeric_status, ma_volume) in param_sets order.
+    """
+    high_f = np.asarray(high, dtype=np.float64)
+    fingerprint = ic.data_fingerprint(high, low, volume) if cache is not None else None
+    new_highs = {}
+    boxes = {}
+    ma_volumes = {}
+    results = []
+    for params in param_sets:
+        lookback_period = params.get("lookback_period", 252)
+        box_period = params.get("box_period", 3)
+        volume_lookback = params.get("volume_lookback", 20)
+
+        if cache is not None:
+            key = cache.key(ticker, "darvas_boxes", fingerprint, (lookback_period, box_period, volume_lookback))
+            cached = cache.get(key)
+            if cached is not None:
+                results.append(cached)
+                continue
+
+        if lookback_period not in new_highs:
+            new_highs[lookback_period] = high_f == _rolling_max(high, lookback_period + 1)
+        if (lookback_period, box_period) not in boxes:
+            boxes[(lookback_period, box_period)] = _box_state_machine(high, low, new_highs[lookback_period],
+                                                                      lookback_period, box_period)[:3]
+        if volume_lookback not in ma_volumes:
+            ma_volume = np.full_like(volume, 0)
+            if volume_lookback > 0:
+                ma_volume[volume_lookback - 1:] = _rolling_mean(volume, volume_lookback)[volume_lookback - 1:]
+            ma_volumes[volume_lookback] = ma_volume
+
+        results.append((*boxes[(lookback_period, box_period)], ma_volumes[volume_lookback]))
+        if cache is not None:
+            cache.put(key, results[-1])
+    return results
+
+
+class DarvasBoxState:
+    """
+    Incremental darvas_boxes. Bars can be fed one at a time or in batches, and the state
+    can be saved (to_dict / DataLoader.save_darvas_state) and resumed later. Feeding a
+    history through any number of update() calls gives the same arrays as one
+    darvas_boxes call over the whole history.
+    """
+
+    def __init__(self, lookback_period=252, box_period=3, volume_lookback=20):
+        self.lookback_period = lookback_period
+        self.box_period = box_period
+        self.volume_lookback = volume_lookback
+        self.bars_seen = 0
+        self.state = STATE_MAP["NO_BOX"]
+        self.high_bound = 0
+        self.low_bound = 0
+        self.remaining_day_forming = box_period
+        self.recent_highs = []  # last lookback_period highs
+        self.recent_volumes = []  # last volume_lookback - 1 volumes
+
+    def update(self, high, low, volume):
+        """Advance over new bars, returns (high_bounds, low_bounds, numeric_status, ma_volume) for them"""
+        high, low, volume = np.atleast_1d(high), np.atleast_1d(low), np.atleast_1d(volume)
+
+        ext_high = np.concatenate((np.asarray(self.recent_highs, dtype=np.float64), high.astype(np.float64)))
+        is_new_high = high.astype(np.float64) == _rolling_max(ext_high, self.lookback_period + 1)[len(self.recent_highs):]
+        first_bar = max(0, self.lookback_period - self.bars_seen)
+        start = (self.state, self.high_bound, self.low_bound, self.remaining_day_forming)
+        high_bounds, low_bounds, numeric_status, end = _box_state_machine(high, low, is_new_high, first_bar,
+                                                                          self.box_period, start=start)
+        self.state, self.high_bound, self.low_bound, self.remaining_day_forming = end
+
+        ma_volume = np.full_like(volume, 0)
+        if self.volume_lookback > 0:
+            ext_volume = np.concatenate((np.asarray(self.recent_volumes, dtype=volume.dtype), volume))
+            ma_mean = _rolling_mean(ext_volume, self.volume_lookback)[len(self.recent_volumes):]
+            first_ma = max(0, self.volume_lookback - 1 - self.bars_seen)
+            ma_volume[first_ma:] = ma_mean[first_ma:]
+            self.recent_volumes = ext_volume[max(0, len(ext_volume) - (self.volume_lookback - 1)):].tolist()
+
+        self.recent_highs = ext_high[max(0, len(ext_high) - self.lookback_period):].tolist()
+        self.bars_seen += len(high)
+        return high_bounds, low_bounds, numeric_status, ma_volume
+
+    def to_dict(self):
+        return {
+            'lookback_period': self.lookback_period,
+            'box_period': self.box_period,
+            'volume_lookback': self.volume_lookback,
+            'bars_seen': self.bars_seen,
+            'state': int(self.state),
+            'high_bound': float(self.high_bound),
+            'low_bound': float(self.low_bound),
+            'remaining_day_forming': int(self.remaining_day_forming),
+            'recent_highs': self.recent_highs,
+            'recent_volumes': self.recent_volumes,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        box_state = cls(data['lookback_period'], data['box_period'], data['volume_lookback'])
+        for k in ('bars_seen', 'state', 'high_bound', 'low_bound', 'remaining_day_forming',
+                  'recent_highs', 'recent_volumes'):
+            setattr(box_state, k, data[k])
+        return box_state
+
+
+def _precomputed(arrays):
+    return arrays
 
-    return high_bounds, low_bounds, numeric_status, ma_volume
 
 class DarvasJojo(Strategy):
     strategy_id : str= "Default Params"
@@ -92,16 +324,38 @@ class DarvasJojo(Strategy):
     atr_factor : float = 3
     trade_tracker : 'trade_tracker.TradeTracker' = None
     storage :'StrategyResults' = None
+    indicators : tuple = None  # precomputed darvas_boxes output, e.g. from darvas_boxes_batch
+    indicator_cache : 'ic.IndicatorCache' = None
+    ticker : str = None
 
     def init(self):
-
-        self.hb, self.lb, self.status, self.ma_vol = self.I(darvas_boxes,  self.data.High, self.data.Low, self.data.Volume,
-                                                            self.lookback_period, self.box_period,
-                                                            self.volume_lookback,
-                                                            plot=True, overlay= False)
+        darvas_name = f"darvas_boxes(High,Low,Volume,{self.lookback_period},{self.box_period},{self.volume_lookback})"
+        if self.indicators is not None and len(self.indicators[0]) == len(self.data):
+            self.hb, self.lb, self.status, self.ma_vol = self.I(_precomputed, self.indicators, name=darvas_name,
+                                                                plot=True, overlay=False)
+        elif self.indicator_cache is not None:
+            darvas_indicators = darvas_boxes_batch(self.data.High, self.data.Low, self.data.Volume,
+                                                   [{"lookback_period": self.lookback_period,
+                                                     "box_period": self.box_period,
+                                                     "volume_lookback": self.volume_lookback}],
+                                                   cache=self.indicator_cache, ticker=self.ticker)[0]
+            self.hb, self.lb, self.status, self.ma_vol = self.I(_precomputed, darvas_indicators, name=darvas_name,
+                                                                plot=True, overlay=False)
+        else:
+            self.hb, self.lb, self.status, self.ma_vol = self.I(darvas_boxes,  self.data.High, self.data.Low, self.data.Volume,
+                                                                self.lookback_period, self.box_period,
+                                                                self.volume_lookback,
+                                                                plot=True, overlay= False)
         self.entry_price = 0.0
         self.stop_val_arr = np.full(len(self.hb), 0, dtype=np.float64)
-        self.atr = self.I(talib.ATR, self.data.High, self.data.Low, self.data.Close, timeperiod=14)
+        if self.indicator_cache is not None:
+            atr_key = self.indicator_cache.key(self.ticker, "ATR",
+                                               ic.data_fingerprint(self.data.High, self.data.Low, self.data.Close), (14,))
+            atr, = self.indicator_cache.get_or_compute(atr_key, talib.ATR, self.data.High, self.data.Low,
+                                                       self.data.Close, timeperiod=14)
+            self.atr = self.I(_precomputed, atr, name="ATR(High,Low,Close,14)")
+        else:
+            self.atr = self.I(talib.ATR, self.data.High, self.data.Low, self.data.Close, timeperiod=14)
         self.last_day = self.data.df.index[-1]
         print("last day = ", self.last_day)
 
@@ -186,26 +440,25 @@ def plot_trade(df: pd.DataFrame, storage: StrategyResults = None, start_date = N
 
     # Get all boxes (your existing box creation method)
 
-    boxes = get_boxes(storage)
+    boxes = box_frame(storage)
 
     # Add only boxes fully contained in time frame
-    for box in boxes:
-        box_start = pd.to_datetime(box['start_date'])
-        box_end = pd.to_datetime(box['end_date'])
-
-        # Check if box is fully within time frame (handles None dates)
-        if ((start_date is None or box_start >= start_date) and
-                (end_date is None or box_end <= end_date)):
-            p.add_layout(BoxAnnotation(
-                left=box['start_date']-timedelta(hours=12),
-                right=box['end_date']+timedelta(hours=12),
-                bottom=box['low_val']*0.999,
-                top=box['high_val']*1.001,
-                fill_alpha=0.1,
-                fill_color="navy",
-                line_color="blue",
-                line_width=0.5
-            ))
+    inside = np.ones(len(boxes), dtype=bool)
+    if start_date is not None:
+        inside &= (boxes['start_date'] >= start_date).to_numpy()
+    if end_date is not None:
+        inside &= (boxes['end_date'] <= end_date).to_numpy()
+    for box in boxes[inside].itertuples():
+        p.add_layout(BoxAnnotation(
+            left=box.start_date-timedelta(hours=12),
+            right=box.end_date+timedelta(hours=12),
+            bottom=box.low_val*0.999,
+            top=box.high_val*1.001,
+            fill_alpha=0.1,
+            fill_color="navy",
+            line_color="blue",
+            line_width=0.5
+        ))
 
     # First ensure we have datetime indices
     stop_dates = pd.to_datetime(storage.date)
@@ -225,26 +478,74 @@ def plot_trade(df: pd.DataFrame, storage: StrategyResults = None, start_date = N
     show(p)
 
 
-def get_boxes(storage: StrategyResults):
-    boxes = []
-    box = None
-    for idx in range(1,len(storage.date)):
-        if storage.box_status[idx-1] == STATE_MAP["NEW_BOX"] and storage.box_status[idx] == STATE_MAP['BOX_FORMING']:
-            box = {
-                'start_date': storage.date[idx-1],
-                'end_date': None,
-                'high_val': storage.high_bounds[idx-1],
-                'low_val': None,
-            }
-        if storage.box_status[idx-1] == STATE_MAP['IN_BOX'] and storage.box_status[idx] != STATE_MAP['IN_BOX']:
-            box['end_date'] = storage.date[idx-1]
-            box['low_val'] = storage.low_bounds[idx-1]
-            boxes.append(box)
-            box = None
-
-    return boxes
+# What ended a box, by the status that follows IN_BOX
+BOX_OUTCOMES = {STATE_MAP["NEW_BOX"]: "breakout", STATE_MAP["BOX_CANCELED"]: "canceled"}
+
+
+def box_frame(storage: StrategyResults) -> pd.DataFrame:
+    """
+    Completed boxes of a StrategyResults, one row each: start_date (the NEW_BOX bar followed by
+    BOX_FORMING), end_date (the last IN_BOX bar), high_val, low_val and outcome ("breakout" or
+    "canceled"). Found from the status transitions over whole arrays; an end is matched to the
+    latest start before it, ends without an unmatched start (e.g. a slice beginning inside a box)
+    are left out.
+    """
+    status = np.asarray(storage.box_status)
+    prev, cur = status[:-1], status[1:]
+    starts = np.flatnonzero((prev == STATE_MAP["NEW_BOX"]) & (cur == STATE_MAP["BOX_FORMING"]))
+    ends = np.flatnonzero((prev == STATE_MAP["IN_BOX"]) & (cur != STATE_MAP["IN_BOX"]))
+    latest_start = np.searchsorted(starts, ends) - 1
+    matched = latest_start >= 0
+    matched[1:] &= latest_start[1:] != latest_start[:-1]  # the previous end already closed that box
+    starts, ends = starts[latest_start[matched]], ends[matched]
+
+    dates = pd.DatetimeIndex(storage.date)
+    return pd.DataFrame({
+        'start_date': dates[starts],
+        'end_date': dates[ends],
+        'high_val': np.asarray(storage.high_bounds)[starts],
+        'low_val': np.asarray(storage.low_bounds)[ends],
+        'outcome': [BOX_OUTCOMES.get(next_status, REVERSE_STATE_MAP.get(next_status))
+                    for next_status in cur[ends].astype(np.int64).tolist()],
+    })
 
 
+def get_boxes(storage: StrategyResults):
+    boxes = box_frame(storage)
+    return [{'start_date': start, 'end_date': end, 'high_val': high, 'low_val': low}
+            for start, end, high, low in zip(boxes['start_date'], boxes['end_date'],
+                                             boxes['high_val'], boxes['low_val'])]
+
+
+def query_boxes(db_path="trades.db", start_date=None, end_date=None, ticker=None, strategy_id=None) -> pd.DataFrame:
+    """
+    Boxes stored with their backtests (runner's store_results=True) that started between start_date
+    and end_date (inclusive), optionally of one ticker or strategy. Boxes depend only on the data and
+    lookback_period/box_period, so backtests sharing those list the same box once each.
+    """
+    # Dates are compared as the stored ISO strings, end_date includes its whole day
+    if start_date is not None:
+        start_date = pd.Timestamp(start_date).isoformat()
+    if end_date is not None:
+        end_date = (pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)).isoformat()
+    filters, params = [], []
+    for condition, value in (("x.start_date >= ?", start_date), ("x.start_date < ?", end_date),
+                             ("x.ticker = ?", ticker), ("b.strategy_id = ?", strategy_id)):
+        if value is not None:
+            filters.append(condition)
+            params.append(value)
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+    with closing(sqlite3.connect(db_path)) as conn:
+        boxes = pd.read_sql_query(f"""
+            SELECT x.backtest_id, x.ticker, b.strategy_id, b.parameters, x.start_date, x.end_date,
+                   x.high, x.low, x.outcome
+            FROM boxes x JOIN backtests b ON b.id = x.backtest_id
+            {where}
+            ORDER BY x.start_date, x.ticker, x.backtest_id
+        """, conn, params=params)
+    for column in ('start_date', 'end_date'):
+        boxes[column] = pd.to_datetime(boxes[column], format='ISO8601')
+    return boxes
 
 
 def plot_indicator(high,low, box_status,high_bounds,low_bounds):
@@ -254,34 +555,29 @@ def plot_indicator(high,low, box_status,high_bounds,low_bounds):
     plt.title('Darvas Box Visualization')
     plt.xlabel('Days')
     plt.ylabel('Price')
-    box_formation_counter = 0
-    # 2. Plot Price Range (like your existing code)
-    for i, (h, l) in enumerate(zip(high, low)):
-        plt.plot([i, i], [l, h], color='grey', linewidth=4)  # Thin lines for price range
-
-        color_map = {0:'grey', 1:'green', 2:'lime', 3:'blue', 4:'red'}
-        plt.plot([i,i], [0,box_status[i]], color=color_map[box_status[i]], linewidth=4 )
+    # 2. Plot Price Range (like your existing code), one collection for all bars
+    x = np.arange(len(box_status))
+    status = np.asarray(box_status)
+    plt.vlines(x, low, high, color='grey', linewidth=4)  # Thin lines for price range
+    color_map = {0:'grey', 1:'green', 2:'lime', 3:'blue', 4:'red'}
+    plt.vlines(x, 0, status, colors=[color_map[s] for s in status.astype(int).tolist()], linewidth=4)
     # 3. Highlight Boxes
-    for i in range(len(box_status)):
-        if box_status[i] == STATE_MAP["NEW_BOX"]:
-            box_formation_counter = 1
-            continue
-        if box_status[i] == STATE_MAP["BOX_FORMING"]:
-            box_formation_counter += 1
-            continue
-        if box_status[i] == STATE_MAP["BOX_CANCELED"]:
-            box_formation_counter = 0
-            continue
-        if box_status[i] == STATE_MAP["IN_BOX"]:
-            # Draw horizontal lines for box boundaries
-            plt.hlines(y=high_bounds[i], xmin=i - box_formation_counter, xmax=i + 0.5,
-                       colors='pink', linestyles='solid', linewidth=2)
-            plt.hlines(y=low_bounds[i], xmin=i - box_formation_counter, xmax=i + 0.5,
-                       colors='pink', linestyles='solid', linewidth=2)
-            # Optional: Fill the box
-            plt.fill_between([i - 0.5, i + 0.5],
-                             low_bounds[i], high_bounds[i],
-                             color='pink', alpha=0.2)
+    # Bars the box took to form: 1 at NEW_BOX, +1 per BOX_FORMING bar, 0 again at BOX_CANCELED
+    resets = (status == STATE_MAP["NEW_BOX"]) | (status == STATE_MAP["BOX_CANCELED"])
+    last_reset = np.maximum.accumulate(np.where(resets, x, -1))
+    forming = np.cumsum(status == STATE_MAP["BOX_FORMING"])
+    forming_before = np.where(last_reset >= 0, forming[np.maximum(last_reset, 0)], 0)
+    box_formation_counter = ((last_reset >= 0) & (status[np.maximum(last_reset, 0)] == STATE_MAP["NEW_BOX"])
+                             ).astype(int) + forming - forming_before
+    in_box = np.flatnonzero(status == STATE_MAP["IN_BOX"])
+    high_bounds, low_bounds = np.asarray(high_bounds)[in_box], np.asarray(low_bounds)[in_box]
+    # Draw horizontal lines for box boundaries
+    plt.hlines(y=high_bounds, xmin=in_box - box_formation_counter[in_box], xmax=in_box + 0.5,
+               colors='pink', linestyles='solid', linewidth=2)
+    plt.hlines(y=low_bounds, xmin=in_box - box_formation_counter[in_box], xmax=in_box + 0.5,
+               colors='pink', linestyles='solid', linewidth=2)
+    # Optional: Fill the box
+    plt.bar(in_box, high_bounds - low_bounds, width=1, bottom=low_bounds, color='pink', alpha=0.2)
 
 
     # 4. Mark Breakouts
@@ -0,0 +1,113 @@
+import itertools
+import math
+import random
+
+import numpy as np
+import pandas as pd
+import talib
+
+from . import data_loader as dl
+from . import fast_engine as fe
+from . import strategy as strat
+from . import trade_tracker as tt
+
+PARAM_NAMES = ["volume_multiplier", "lookback_period", "box_period", "volume_lookback", "atr_factor"]
+
+
+def grid_search_space(space: dict) -> list:
+    """All combinations of the candidate values in space, e.g. {"lookback_period": [126, 252], ...}"""
+    names = [name for name in PARAM_NAMES if name in space]
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_search_space(space: dict, n: int, seed=None) -> list:
+    """n distinct combinations drawn at random from the candidate values in space"""
+    names = [name for name in PARAM_NAMES if name in space]
+    if n >= int(np.prod([len(space[name]) for name in names])):
+        return grid_search_space(space)
+    rng = random.Random(seed)
+    param_sets = {}
+    while len(param_sets) < n:
+        values = tuple(rng.choice(space[name]) for name in names)
+        param_sets.setdefault(values, dict(zip(names, values)))
+    return list(param_sets.values())
+
+
+def losing_param_sets(active, mean_returns, prune_fraction=0.5) -> set:
+    """
+    Which of the active parameter sets to prune: those with a negative mean return strictly below
+    the prune_fraction quantile, worst first, while at least (1 - prune_fraction) of them (and
+    always the best one) are kept. Tied returns are never split into pruned and kept ones
+    beyond that, so a sweep where every set has the same loss keeps all of them.
+    """
+    mean_returns = np.asarray(mean_returns, dtype=np.float64)
+    cutoff = np.quantile(mean_returns, prune_fraction)
+    keep = max(1, math.ceil((1 - prune_fraction) * len(active)))
+    candidates = sorted((r, k) for k, r in zip(active, mean_returns) if r < 0 and r < cutoff)
+    return {k for _, k in candidates[:max(0, len(active) - keep)]}
+
+
+def run_sweep(sweep_id, param_sets, csv_path="good_tickers.csv", min_duration_days=300,
+              prune_after=20, prune_fraction=0.5, tracker: 'tt.TradeTracker' = None,
+              loader: 'dl.DataLoader' = None) -> pd.DataFrame:
+    """
+    Backtest every parameter set on every ticker of csv_path with the fast engine.
+
+    Each ticker is loaded once; darvas_boxes_batch shares rolling highs, volume averages and
+    box states between parameter sets, and ATR is computed once per ticker. Backtests are
+    written to the backtests/trades tables with strategy_id "<sweep_id>_<index>" and the
+    sweep_id column set.
+    Every prune_after tickers, parameter sets with a negative mean return that are in the
+    bottom prune_fraction are dropped for the rest of the sweep (prune_after=None disables it).
+    Returns one row per parameter set with mean return, trade count and when it was pruned.
+    """
+    tracker = tracker or tt.TradeTracker(flush_every=tt.BATCH_FLUSH_EVERY, compact=True)
+    loader = loader or dl.DataLoader()
+    strategy_ids = [f"{sweep_id}_{i:04d}" for i in range(len(param_sets))]
+    returns = [[] for _ in param_sets]
+    trade_counts = [0] * len(param_sets)
+    pruned_at = [None] * len(param_sets)
+    active = list(range(len(param_sets)))
+
+    tickers_and_timespan = pd.read_csv(csv_path)
+    tickers_done = 0
+    for index, row in tickers_and_timespan.iterrows():
+        if not active:
+            break
+        ticker, start_date, end_date = row['ticker'], row['start_date'], row['end_date']
+        if row['duration_days'] < min_duration_days:
+            continue
+
+        data = loader.fetch_data(ticker, start_date, end_date)
+        if data is None or data.empty:
+            print(f"[SKIP] No data for {ticker} from {start_date} to {end_date}, skipping.")
+            continue
+        print(f"Sweep {sweep_id}: {ticker} with {len(active)} parameter sets, ticker number is {index}")
+
+        indicators = strat.darvas_boxes_batch(data['High'].to_numpy(), data['Low'].to_numpy(),
+                                              data['Volume'].to_numpy(), [param_sets[k] for k in active])
+        atr = talib.ATR(*(data[c].to_numpy(dtype=np.float64) for c in ('High', 'Low', 'Close')), timeperiod=14)
+        for k, darvas_indicators in zip(active, indicators):
+            tracker.start_tracking(strategy_ids[k], ticker, start_date, end_date, param_sets[k], sweep_id=sweep_id)
+            result = fe.run_darvas_fast(data, param_sets[k], strategy_id=strategy_ids[k], trade_tracker=tracker,
+                                        indicators=darvas_indicators, atr=atr)
+            tracker.finalize_backtest_to_db()
+            returns[k].append(result.return_pct)
+            trade_counts[k] += len(result.tracker_trades)
+        tickers_done += 1
+
+        if prune_after and tickers_done % prune_after == 0 and len(active) > 1:
+            losing = losing_param_sets(active, [np.mean(returns[k]) for k in active], prune_fraction)
+            for k in losing:
+                pruned_at[k] = tickers_done
+            active = [k for k in active if k not in losing]
+            print(f"Sweep {sweep_id}: pruned {len(losing)} losing parameter sets, {len(active)} left")
+
+    tracker.flush()
+    summary = pd.DataFrame(param_sets)
+    summary.insert(0, 'strategy_id', strategy_ids)
+    summary['tickers'] = [len(r) for r in returns]
+    summary['mean_return_pct'] = [np.mean(r) if r else np.nan for r in returns]
+    summary['trades'] = trade_counts
+    summary['pruned_after_tickers'] = pruned_at
+    return summary.sort_values('mean_return_pct', ascending=False, ignore_index=True)
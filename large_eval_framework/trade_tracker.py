@@ -4,8 +4,15 @@ import json
 from typing import List, Optional
 from dataclasses import dataclass
 from typing import Dict, Any
+import numpy as np
 import pandas as pd
 import sqlite3
+from contextlib import closing
+
+from . import analytics
+
+# Backtests per transaction for bulk writers like the runner and parameter sweeps
+BATCH_FLUSH_EVERY = 100
 
 
 @dataclass
@@ -16,6 +23,7 @@ class TradeMetaData:
     end_date: str
     parameters: Dict[str, Any]
     metrics: Dict[str, Any] = None
+    sweep_id: Optional[str] = None
 
 
 @dataclass
@@ -35,6 +43,7 @@ class Trade:
     id: Optional[int] = None
     ticker: Optional[str] = None
     parameters: Optional[dict] = None
+    backtest_id: Optional[int] = None
 
     @classmethod
     def from_complete_data(cls,
@@ -86,19 +95,142 @@ class Trade:
                 f"IN:{self.entry_time.strftime('%Y-%m-%d')}@{self.entry_price:.2f}|"
                 f"OUT:{self.exit_time.strftime('%Y-%m-%d') if self.exit_time else 'OPEN'}@{self.exit_price or 0:.2f}>")
 
+_NS_PER_DAY = 86_400_000_000_000
+
+
+class TradeBuffer:
+    """
+    Closed trades of one backtest as columns of a preallocated NumPy structured array (times as
+    int64 nanoseconds, prices as float64) that doubles when full, instead of one Trade object each.
+    pnl and duration are computed for all trades at once; rows() feeds executemany and
+    to_trades() builds Trade objects only when asked. Times have to be tz-naive.
+    """
+    DTYPE = np.dtype([('entry_time', 'i8'), ('exit_time', 'i8'), ('entry_price', 'f8'), ('exit_price', 'f8')])
+
+    def __init__(self, capacity = 64, strategy_id = None):
+        self.strategy_id = strategy_id
+        self._data = np.empty(capacity, dtype=self.DTYPE)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def records(self) -> np.ndarray:
+        return self._data[:self._size]
+
+    @property
+    def pnl(self) -> np.ndarray:
+        """Return of each trade in percent, like Trade.close"""
+        records = self.records
+        return (records['exit_price'] - records['entry_price']) / records['entry_price'] * 100
+
+    @property
+    def duration(self) -> np.ndarray:
+        """Whole days each trade was held, like timedelta.days"""
+        records = self.records
+        return (records['exit_time'] - records['entry_time']) // _NS_PER_DAY
+
+    def append(self, entry_time, entry_price, exit_time, exit_price):
+        if self._size == len(self._data):
+            self._grow(self._size + 1)
+        self._data[self._size] = (_time_ns(entry_time), _time_ns(exit_time), entry_price, exit_price)
+        self._size += 1
+
+    def extend(self, other: 'TradeBuffer'):
+        n = len(other)
+        if self._size + n > len(self._data):
+            self._grow(self._size + n)
+        self._data[self._size:self._size + n] = other.records
+        self._size += n
+        if self.strategy_id is None:
+            self.strategy_id = other.strategy_id
+
+    def clear(self):
+        self._size = 0
+
+    def copy(self) -> 'TradeBuffer':
+        buffer = TradeBuffer(max(1, self._size), self.strategy_id)
+        buffer.extend(self)
+        return buffer
+
+    def rows(self) -> list:
+        """(entry_time, exit_time, entry_price, exit_price, pnl, duration) tuples as stored in the trades table"""
+        records = self.records
+        return list(zip(_isoformat(records['entry_time']), _isoformat(records['exit_time']),
+                        records['entry_price'].tolist(), records['exit_price'].tolist(),
+                        self.pnl.tolist(), self.duration.tolist()))
+
+    def to_trades(self) -> List['Trade']:
+        records = self.records
+        return [Trade(self.strategy_id, pd.Timestamp(entry_time), entry_price, pd.Timestamp(exit_time), exit_price,
+                      pnl, duration)
+                for entry_time, exit_time, entry_price, exit_price, pnl, duration
+                in zip(records['entry_time'].tolist(), records['exit_time'].tolist(),
+                       records['entry_price'].tolist(), records['exit_price'].tolist(),
+                       self.pnl.tolist(), self.duration.tolist())]
+
+    @classmethod
+    def from_trades(cls, trades: List['Trade']) -> 'TradeBuffer':
+        buffer = cls(max(1, len(trades)), trades[0].strategy_id if trades else None)
+        for trade in trades:
+            buffer.append(trade.entry_time, trade.entry_price, trade.exit_time, trade.exit_price)
+        return buffer
+
+    # --- Private methods below ---
+
+    def _grow(self, needed):
+        data = np.empty(max(needed, 2 * len(self._data)), dtype=self.DTYPE)
+        data[:self._size] = self._data[:self._size]
+        self._data = data
+
+
+def _time_ns(time) -> int:
+    if not isinstance(time, pd.Timestamp):
+        time = pd.Timestamp(time)
+    if time.tz is not None:
+        raise ValueError(f"TradeBuffer needs tz-naive times, got {time}")
+    return time.value
+
+
+def _isoformat(times_ns: np.ndarray) -> list:
+    """Same strings as Timestamp.isoformat(), vectorized for the usual whole-second times"""
+    if not (times_ns % 1_000_000_000).any():
+        return np.datetime_as_string(times_ns.view('datetime64[ns]').astype('datetime64[s]')).tolist()
+    return [pd.Timestamp(t).isoformat() for t in times_ns.tolist()]
+
+
 class TradeTracker:
-    def __init__(self, json_file = "backtest_results.json", db_path = "trades.db"):
-        self.trades : List[Trade] = []
-        self.current_trade = None
+    def __init__(self, json_file = "backtest_results.jsonl", db_path = "trades.db", flush_every = 1,
+                 compact = False):
+        """
+        json_file: where append_trades_to_json writes, one JSON line per backtest. A path ending in
+            .json keeps the old single-document format, which is rewritten on every append.
+        flush_every: finished backtests are buffered and written in one transaction once this
+            many are pending (1 writes each one right away). Call flush() when done.
+        compact: keep the current backtest's trades in a TradeBuffer (see trade_buffer) instead of a
+            list of Trade objects; `trades` then builds them on each access
+        """
+        self._trades : List[Trade] = []
+        self.trade_buffer = TradeBuffer() if compact else None
+        self.current_trade = None  # Trade, or (strategy_id, entry_time, entry_price) when compact
         self.metadata = None
         self.total_trades_made = 0
         self.json_file = json_file
+        self.flush_every = flush_every
+        self._pending = []  # (metadata, trade rows, encoded results, box rows) of finished backtests not written yet
         self.conn = sqlite3.connect(db_path)
+        # WAL keeps readers (analysis, plots) from blocking the writer; NORMAL sync is safe with it
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
         self._create_tables()
 
+        if self.json_file is None:
+            return  # in-memory use, e.g. collecting trades inside a worker process
         if not os.path.exists(self.json_file):
             with open(self.json_file, 'w') as f:
-                json.dump({"backtests":[]},f)
+                if _is_legacy_json(self.json_file):
+                    json.dump({"backtests":[]},f)
             print("created JSON file to track trades")
         else:
             print("JSON file already exists, let's go")
@@ -120,10 +252,35 @@ class TradeTracker:
                 start_date TEXT NOT NULL, 
                 end_date TEXT NOT NULL, 
                 parameters TEXT NOT NULL, 
+                sweep_id TEXT,
                 FOREIGN KEY (strategy_id, ticker)
                     REFERENCES processed_tickers(strategy_id, ticker)
             );
             
+            CREATE TABLE IF NOT EXISTS strategy_results(
+                backtest_id INTEGER PRIMARY KEY,
+                date BLOB NOT NULL,
+                high_bounds BLOB NOT NULL,
+                low_bounds BLOB NOT NULL,
+                box_status BLOB NOT NULL,
+                stop_values BLOB NOT NULL,
+                FOREIGN KEY (backtest_id) REFERENCES backtests(id)
+            );
+
+            CREATE TABLE IF NOT EXISTS boxes(
+                backtest_id INTEGER NOT NULL,
+                ticker TEXT NOT NULL,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                high REAL NOT NULL,
+                low REAL NOT NULL,
+                outcome TEXT NOT NULL,
+                PRIMARY KEY (backtest_id, start_date),
+                FOREIGN KEY (backtest_id) REFERENCES backtests(id)
+            );
+            CREATE INDEX IF NOT EXISTS boxes_start_date ON boxes(start_date);
+            CREATE INDEX IF NOT EXISTS boxes_ticker_start_date ON boxes(ticker, start_date);
+
             CREATE TABLE IF NOT EXISTS trades (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 backtest_id INTEGER NOT NULL, 
@@ -136,78 +293,142 @@ class TradeTracker:
                 FOREIGN KEY (backtest_id) REFERENCES backtests(id)
             );
             """)
+            # Databases created before parameter sweeps lack the sweep_id column
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(backtests)")}
+            if "sweep_id" not in columns:
+                self.conn.execute("ALTER TABLE backtests ADD COLUMN sweep_id TEXT")
 
-    def finalize_backtest_to_db(self):
-        """Save completed backtest results to db with duplicate prevention"""
+            self.conn.execute("CREATE INDEX IF NOT EXISTS trades_backtest_id ON trades(backtest_id)")
+            analytics.create_tables(self.conn)
+        try:
+            with self.conn:
+                self.conn.execute("""CREATE UNIQUE INDEX IF NOT EXISTS backtests_key
+                    ON backtests(strategy_id, ticker, start_date, end_date)""")
+            self._unique_key = True
+        except sqlite3.IntegrityError:
+            # Duplicates written by older versions: keep checking for them before inserting
+            print("backtests has duplicate (strategy_id, ticker, start_date, end_date) rows, "
+                  "remove them to enable the unique index")
+            with self.conn:
+                self.conn.execute("""CREATE INDEX IF NOT EXISTS backtests_key_nonunique
+                    ON backtests(strategy_id, ticker, start_date, end_date)""")
+            self._unique_key = False
+
+    @property
+    def trades(self) -> List[Trade]:
+        if self.trade_buffer is not None:
+            return self.trade_buffer.to_trades()
+        return self._trades
+
+    def finalize_backtest_to_db(self, results = None, boxes = None):
+        """
+        Save completed backtest results to db with duplicate prevention.
+        results: the backtest's strategy.StrategyResults (or their encode() output) to keep in the
+            strategy_results table, so plots can read them instead of rerunning the backtest
+        boxes: rows for the boxes table (StrategyResults.box_rows()), taken from results if not given
+        Returns the backtest id, or None while the backtest is still buffered (flush_every > 1).
+        """
         if not self.metadata:
             return
 
+        trade_data = self.trade_buffer.rows() if self.trade_buffer is not None else [
+            (
+                trade.entry_time.isoformat(),
+                trade.exit_time.isoformat(),
+                trade.entry_price,
+                trade.exit_price,
+                trade.pnl,
+                trade.duration
+            )
+            for trade in self._trades
+        ]
+        if results is not None and hasattr(results, "encode"):
+            boxes = results.box_rows() if boxes is None and results.date is not None else boxes
+            results = results.encode()
+        self._pending.append((self.metadata, trade_data, results, boxes))
+        if len(self._pending) >= self.flush_every:
+            return self.flush()[-1]
+
+    def flush(self):
+        """Write all buffered backtests in one transaction, returns their backtest ids"""
+        if not self._pending:
+            return []
+        # Only dropped once committed, a failed or interrupted flush leaves them for the next one
+        pending = list(self._pending)
+        backtest_ids = []
         try:
             with self.conn:
-                # First check if identical backtest already exists
-                cursor = self.conn.execute("""
-                    SELECT id FROM backtests 
-                    WHERE strategy_id = ? 
-                    AND ticker = ?
-                    AND start_date = ?
-                    AND end_date = ?
-                    LIMIT 1
-                """, (
-                    self.metadata.strategy_id,
-                    self.metadata.ticker,
-                    self.metadata.start_date,
-                    self.metadata.end_date
-                ))
-
-                existing = cursor.fetchone()
-                if existing:
-                    print(f"Identical backtest already exists (ID: {existing[0]})")
-                    return existing[0]  # Return existing backtest ID
-
-                # Mark ticker as processed for this strategy
-                self.conn.execute("""
+                # Mark tickers as processed for their strategy
+                self.conn.executemany("""
                     INSERT OR IGNORE INTO processed_tickers
                     (strategy_id, ticker) VALUES(?, ?)
-                """, (self.metadata.strategy_id, self.metadata.ticker))
-
-                # Insert new backtest
-                cursor = self.conn.execute("""
-                    INSERT INTO backtests
-                    (strategy_id, ticker, start_date, end_date, parameters) 
-                    VALUES(?,?,?,?,?)
-                    RETURNING id
-                """, (
-                    self.metadata.strategy_id,
-                    self.metadata.ticker,
-                    self.metadata.start_date,
-                    self.metadata.end_date,
-                    json.dumps(self.metadata.parameters)
-                ))
-                backtest_id = cursor.fetchone()[0]
+                """, [(metadata.strategy_id, metadata.ticker) for metadata, *_ in pending])
+
+                trade_rows = []
+                result_rows = []
+                box_rows = []
+                new_ids = []
+                for metadata, trade_data, results, boxes in pending:
+                    key = (metadata.strategy_id, metadata.ticker, metadata.start_date, metadata.end_date)
+                    existing = None
+                    if not self._unique_key:
+                        existing = self.conn.execute("""
+                            SELECT id FROM backtests
+                            WHERE strategy_id = ? AND ticker = ? AND start_date = ? AND end_date = ?
+                            LIMIT 1
+                        """, key).fetchone()
+                    inserted = None if existing else self.conn.execute("""
+                        INSERT OR IGNORE INTO backtests
+                        (strategy_id, ticker, start_date, end_date, parameters, sweep_id)
+                        VALUES(?,?,?,?,?,?)
+                        RETURNING id
+                    """, key + (json.dumps(metadata.parameters), metadata.sweep_id)).fetchone()
+
+                    if inserted is None:
+                        # Identical backtest already exists, keep its trades
+                        existing = existing or self.conn.execute("""
+                            SELECT id FROM backtests
+                            WHERE strategy_id = ? AND ticker = ? AND start_date = ? AND end_date = ?
+                        """, key).fetchone()
+                        print(f"Identical backtest already exists (ID: {existing[0]})")
+                        backtest_ids.append(existing[0])
+                        if results is not None:
+                            result_rows.append((existing[0],) + results)
+                        if boxes is not None:
+                            box_rows.extend((existing[0], metadata.ticker) + box for box in boxes)
+                        continue
+
+                    backtest_id = inserted[0]
+                    if results is not None:
+                        result_rows.append((backtest_id,) + results)
+                    if boxes is not None:
+                        box_rows.extend((backtest_id, metadata.ticker) + box for box in boxes)
+                    backtest_ids.append(backtest_id)
+                    new_ids.append(backtest_id)
+                    trade_rows.extend((backtest_id,) + row for row in trade_data)
 
                 # Insert trades
-                trade_data = [
-                    (
-                        backtest_id,
-                        trade.entry_time.isoformat(),
-                        trade.exit_time.isoformat(),
-                        trade.entry_price,
-                        trade.exit_price,
-                        trade.pnl,
-                        trade.duration
-                    )
-                    for trade in self.trades
-                ]
                 self.conn.executemany("""
                     INSERT INTO trades (backtest_id, entry_time, exit_time, entry_price, exit_price, pnl, duration)
                     VALUES(?,?,?,?,?,?,?)
-                """, trade_data)
-
-                return backtest_id
+                """, trade_rows)
+                self.conn.executemany("""
+                    INSERT OR IGNORE INTO strategy_results
+                    (backtest_id, date, high_bounds, low_bounds, box_status, stop_values)
+                    VALUES(?,?,?,?,?,?)
+                """, result_rows)
+                self.conn.executemany("""
+                    INSERT OR IGNORE INTO boxes (backtest_id, ticker, start_date, end_date, high, low, outcome)
+                    VALUES(?,?,?,?,?,?,?)
+                """, box_rows)
+                analytics.update_summaries(self.conn, new_ids)
+            del self._pending[:len(pending)]
+            return backtest_ids
 
         except sqlite3.Error as e:
             print(f"Database error: {e}")
             raise
+
     def check_if_already_ran(self, strategy_id: str, ticker: str):
         """Check if ticker and strategy have already been run
 
@@ -216,6 +437,7 @@ class TradeTracker:
 
             return: True if already processed, else false
             """
+        self.flush()
         try:
             cursor = self.conn.execute("""SELECT 1 FROM processed_tickers WHERE strategy_id = ? AND ticker = ?""",
                                        (strategy_id, ticker))
@@ -224,9 +446,26 @@ class TradeTracker:
             print(f"Database error checking processed tickers: {e}")
             return False
 
+    def get_processed_pairs(self, strategy_ids = None) -> set:
+        """
+        (strategy_id, ticker) pairs already processed, in one query: all of them, or only those of
+        strategy_ids (e.g. the configs about to run, leaving out the rows of sweeps)
+        """
+        self.flush()
+        try:
+            if strategy_ids is None:
+                return set(self.conn.execute("SELECT strategy_id, ticker FROM processed_tickers"))
+            return set(self.conn.execute("""
+                SELECT strategy_id, ticker FROM processed_tickers
+                WHERE strategy_id IN (SELECT value FROM json_each(?))
+            """, (json.dumps(list(strategy_ids)),)))
+        except sqlite3.Error as e:
+            print(f"Database error reading processed tickers: {e}")
+            return set()
+
     def lookup_trade(trade_id: int, db_path: str = "trades.db") -> Optional[Trade]:
         try:
-            with sqlite3.connect(db_path) as conn:
+            with closing(sqlite3.connect(db_path)) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute("""
                     SELECT t.*, b.strategy_id, b.ticker, b.parameters 
@@ -249,30 +488,50 @@ class TradeTracker:
             print(f"Error loading trade {trade_id}: {str(e)}")
         return None
 
-    def start_tracking(self, strategy_id, ticker, start_date, end_date, params):
+    def start_tracking(self, strategy_id, ticker, start_date, end_date, params, sweep_id=None):
         self.metadata = TradeMetaData(strategy_id=strategy_id,
                                       ticker=ticker,
                                       start_date=start_date,
                                       end_date=end_date,
-                                      parameters=params)
+                                      parameters=params,
+                                      sweep_id=sweep_id)
         self.current_trade = None
-        self.trades.clear()
+        self._trades.clear()
+        if self.trade_buffer is not None:
+            self.trade_buffer.clear()
+            self.trade_buffer.strategy_id = strategy_id
 
     def open_trade(self, strategy_id, entry_time, entry_price):
         if self.current_trade is None:
-            self.current_trade = Trade(strategy_id, entry_time, entry_price)
+            if self.trade_buffer is not None:
+                self.current_trade = (strategy_id, entry_time, entry_price)
+            else:
+                self.current_trade = Trade(strategy_id, entry_time, entry_price)
         else:
             print("there is already a trade running")
 
     def close_trade(self, exit_time, exit_price):
         if self.current_trade is not None:
-            self.current_trade.close(exit_time, exit_price)
-            self.trades.append(self.current_trade)
+            if self.trade_buffer is not None:
+                strategy_id, entry_time, entry_price = self.current_trade
+                self.trade_buffer.strategy_id = strategy_id
+                self.trade_buffer.append(entry_time, entry_price, exit_time, exit_price)
+            else:
+                self.current_trade.close(exit_time, exit_price)
+                self._trades.append(self.current_trade)
             self.current_trade = None
             self.total_trades_made+=1
         else:
             print("there is not open trade to close")
 
+    def record_trades(self, trades):
+        """Add already closed trades (a list of Trade or a TradeBuffer), e.g. collected by a worker process"""
+        if self.trade_buffer is not None:
+            self.trade_buffer.extend(trades if isinstance(trades, TradeBuffer) else TradeBuffer.from_trades(trades))
+        else:
+            self._trades.extend(trades.to_trades() if isinstance(trades, TradeBuffer) else trades)
+        self.total_trades_made += len(trades)
+
 
     def append_trades_to_json(self):
         if self.metadata is None:
@@ -283,6 +542,18 @@ class TradeTracker:
             },
             "trades":[t.to_dict() for t in self.trades]
         }
+        if not _is_legacy_json(self.json_file):
+            # One line per backtest, appending costs the same however long the file is
+            with open(self.json_file, 'ab+') as f:
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        # Partial last line of a run killed mid-write, keep this record off it
+                        f.write(b"\n")
+                f.write((json.dumps(data) + "\n").encode())
+            print(f"Appended {len(data['trades'])} Trades to {self.json_file}")
+            return
+
         with open(self.json_file, 'r') as f:
             all_data = json.load(f)
 
@@ -291,25 +562,16 @@ class TradeTracker:
         with open(self.json_file, 'w') as f:
             json.dump(all_data, f, indent=2)
 
-        print(f"Appended {len(self.trades)} Trades to {self.json_file}")
+        print(f"Appended {len(data['trades'])} Trades to {self.json_file}")
 
 
 
     def get_total_trades_made(self):
         return self.total_trades_made
     def json_to_dataframe(self, json_path) -> pd.DataFrame:
-        with open(json_path, 'r') as f:
-            data = json.load(f)
-        rows = []
-        for run in data["backtests"]:
-            for trade in run["trades"]:
-                row = {
-                    **trade,
-                    **{f"meta_{k}":v for k,v in run["metadata"].items()}
-                       }
-                rows.append(row)
-
-        return pd.DataFrame(rows)
+        """All trades of a results file, one row per trade with meta_* columns for its backtest"""
+        chunks = list(iter_results(json_path))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
 
     def append_trades_to_df(self):
         pass
@@ -334,6 +596,43 @@ class TradeTracker:
             print(f"{i}. {trade}")
 
 
+def _is_legacy_json(path) -> bool:
+    return str(path).endswith(".json")
+
+
+def iter_results(json_path, chunksize = 10_000):
+    """
+    Streams the trades of a results file (JSON lines, or the old single-document .json) as
+    DataFrames of up to chunksize rows, one row per trade with meta_* columns for its backtest,
+    so memory stays bounded however large the file is.
+    """
+    def backtests():
+        if _is_legacy_json(json_path):
+            with open(json_path, 'r') as f:
+                yield from json.load(f)["backtests"]
+            return
+        with open(json_path, 'r') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # e.g. the last line of a run that was killed mid-write
+                    print(f"Skipping unreadable line {line_number} of {json_path}")
+
+    rows = []
+    for run in backtests():
+        meta = {f"meta_{k}": v for k, v in run["metadata"].items()}
+        for trade in run["trades"]:
+            rows.append({**trade, **meta})
+            if len(rows) >= chunksize:
+                yield pd.DataFrame(rows)
+                rows = []
+    if rows:
+        yield pd.DataFrame(rows)
+
+
 def lookup_trade(trade_id: int, db_path: str = "trades.db") -> Optional[Trade]:
     """
     Standalone function to retrieve a trade by ID from SQLite database.
@@ -346,11 +645,12 @@ def lookup_trade(trade_id: int, db_path: str = "trades.db") -> Optional[Trade]:
         Trade object if found, None otherwise
     """
     try:
-        with sqlite3.connect(db_path) as conn:
+        with closing(sqlite3.connect(db_path)) as conn:
             conn.row_factory = sqlite3.Row  # Access columns by name
             cursor = conn.execute("""
                 SELECT 
                     t.id,
+                    t.backtest_id,
                     t.entry_time, 
                     t.exit_time, 
                     t.entry_price, 
@@ -380,8 +680,10 @@ def lookup_trade(trade_id: int, db_path: str = "trades.db") -> Optional[Trade]:
                 exit_price=row['exit_price'],
                 pnl=row['pnl'],
                 duration=row['duration'],
+                id=row['id'],
                 ticker=row['ticker'],
-                parameters=json.loads(row['parameters'])
+                parameters=json.loads(row['parameters']),
+                backtest_id=row['backtest_id']
             )
 
     except sqlite3.Error as e:
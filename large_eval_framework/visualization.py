@@ -1,22 +1,45 @@
+import json
+import sqlite3
+from contextlib import closing
+
 from . import trade_tracker as tt
 from . import strategy as strat
 from . import data_loader as dl
+from . import indicator_cache as ic
 import pandas as pd
 import numpy as np
 from backtesting import Backtest
+from bokeh.io import save
+from bokeh.layouts import column
+from bokeh.models import ColumnDataSource, Range1d
+from bokeh.plotting import figure
+from bokeh.resources import CDN, INLINE
 
 
-def plot_trade(trade_id, preceding_days: int, trailing_days: int):
+def plot_trade(trade_id, preceding_days: int, trailing_days: int, indicator_cache_dir="indicator_cache",
+               db_path="trades.db"):
+    """
+    Candlesticks, Darvas boxes and stop line around a trade. Uses the StrategyResults stored with
+    its backtest (runner's store_results=True) when there are any, otherwise reruns the backtest.
+    """
     # Trade lookup and validation
-    trade = tt.lookup_trade(trade_id)
+    trade = tt.lookup_trade(trade_id, db_path)
     print("-------------------------------")
     print(f"Plotting trade: {trade}")
     print(f"Entry time: {trade.entry_time}")
     print(f"Exit time: {trade.exit_time}")
 
-    # Date range calculation with validation
-    start_date = trade.entry_time - pd.Timedelta(days=400)
-    end_date = (trade.exit_time if trade.exit_time else pd.Timestamp.now()) + pd.Timedelta(days=trailing_days)
+    # Plot range calculation
+    plot_start = trade.entry_time - pd.Timedelta(days=preceding_days)
+    plot_end = (trade.exit_time if trade.exit_time else pd.Timestamp.now()) + pd.Timedelta(days=trailing_days)
+    # Whole backtest, boxes starting before plot_start are still found (and then left out by plot_trade)
+    storage = strat.load_strategy_results(trade.backtest_id, db_path) if trade.backtest_id is not None else None
+    if storage is not None:
+        print(f"Using the stored strategy results of backtest {trade.backtest_id}")
+
+    # Date range calculation with validation, the backtest needs a year of warm-up before the trade
+    start_date = plot_start if storage is not None else trade.entry_time - pd.Timedelta(days=400)
+    end_date = plot_end
     print(f"Requested data range: {start_date} to {end_date}")
 
     # Data loading with debug output
@@ -29,9 +52,11 @@ def plot_trade(trade_id, preceding_days: int, trailing_days: int):
     print(f"Missing dates: {pd.date_range(start=data.index[0], end=data.index[-1]).difference(data.index)}")
 
     # Backtest execution
-    storage = strat.StrategyResults()
-    bt = Backtest(data, strat.DarvasJojo, commission=.002, exclusive_orders=True)
-    bt.run(**trade.parameters, storage=storage)
+    if storage is None:
+        storage = strat.StrategyResults()
+        bt = Backtest(data, strat.DarvasJojo, commission=.002, exclusive_orders=True)
+        cache = ic.IndicatorCache(indicator_cache_dir) if indicator_cache_dir else None
+        bt.run(**trade.parameters, storage=storage, indicator_cache=cache, ticker=trade.ticker)
 
     # Strategy results validation
     print("\nStrategy results validation:")
@@ -39,9 +64,6 @@ def plot_trade(trade_id, preceding_days: int, trailing_days: int):
     print(f"First strategy date: {storage.date[0]}")
     print(f"Last strategy date: {storage.date[-1]}")
 
-    # Plot range calculation
-    plot_start = trade.entry_time - pd.Timedelta(days=preceding_days)
-    plot_end = (trade.exit_time if trade.exit_time else pd.Timestamp.now()) + pd.Timedelta(days=trailing_days)
     print(f"\nPlot range: {plot_start} to {plot_end}")
 
     # Verify data coverage for plotting
@@ -61,4 +83,138 @@ def plot_trade(trade_id, preceding_days: int, trailing_days: int):
         start_date=plot_start,
         end_date=plot_end
     )
-    print("------------------------")
\ No newline at end of file
+    print("------------------------")
+
+def trade_review_report(trade_ids, path="trade_review.html", preceding_days=60, trailing_days=30, max_bars=2000,
+                        db_path="trades.db", loader=None, indicator_cache_dir="indicator_cache", inline=False):
+    """
+    Review many trades in one static HTML file, written without opening a browser: a candlestick
+    chart per trade (in trade_ids order) with its Darvas boxes, stop line and entry/exit markers.
+
+    Trades of the same backtest share one set of ColumnDataSources (bars, boxes, trades) and each
+    chart only zooms to its own window, so a ticker's data is in the file once. Bars outside every
+    trade window are merged into coarser candles until a backtest has at most about max_bars.
+    Uses the StrategyResults stored with the backtest (runner's store_results=True), otherwise
+    reruns the backtest once for all its trades.
+    inline: embed BokehJS in the file instead of loading it from the CDN when viewing.
+    Returns the path written.
+    """
+    trades = _review_trades(trade_ids, db_path)
+    loader = loader or dl.DataLoader()
+    cache = ic.IndicatorCache(indicator_cache_dir) if indicator_cache_dir else None
+    preceding, trailing = pd.Timedelta(days=preceding_days), pd.Timedelta(days=trailing_days)
+
+    charts = {}
+    for backtest_id, group in trades.groupby('backtest_id', sort=False):
+        ticker, parameters = group['ticker'].iloc[0], group['parameters'].iloc[0]
+        window_starts, window_ends = group['entry_time'] - preceding, group['exit_time'] + trailing
+        storage = strat.load_strategy_results(backtest_id, db_path)
+        # Without stored results the backtest is rerun, with a year of warm-up before the first trade
+        data_start = window_starts.min() if storage is not None else group['entry_time'].min() - pd.Timedelta(days=400)
+        data = loader.fetch_data(ticker, data_start, window_ends.max())
+        if data is None or data.empty:
+            print(f"[SKIP] No data for {ticker}, leaving out trades {group['trade_id'].tolist()}")
+            continue
+        if storage is None:
+            storage = strat.StrategyResults()
+            bt = Backtest(data, strat.DarvasJojo, commission=.002, exclusive_orders=True)
+            bt.run(**parameters, storage=storage, indicator_cache=cache, ticker=ticker)
+        data = data.loc[window_starts.min():window_ends.max()]
+
+        bars = ColumnDataSource(_lod_bars(data, storage, window_starts, window_ends, max_bars))
+        boxes = strat.box_frame(storage)
+        box_source = ColumnDataSource({'left': boxes['start_date'] - pd.Timedelta(hours=12),
+                                       'right': boxes['end_date'] + pd.Timedelta(hours=12),
+                                       'bottom': boxes['low_val'] * 0.999, 'top': boxes['high_val'] * 1.001})
+        trade_source = ColumnDataSource(group[['trade_id', 'entry_time', 'exit_time', 'entry_price', 'exit_price',
+                                               'pnl']])
+        for trade, start, end in zip(group.itertuples(), window_starts, window_ends):
+            charts[trade.trade_id] = _review_chart(trade, start, end, bars, box_source, trade_source)
+
+    missing = [trade_id for trade_id in trade_ids if trade_id not in charts]
+    if missing:
+        print(f"Trades not in the report: {missing}")
+    save(column([charts[trade_id] for trade_id in trade_ids if trade_id in charts]), filename=path,
+         resources=INLINE if inline else CDN, title=f"Review of {len(charts)} trades")
+    print(f"Wrote {len(charts)} trades to {path}")
+    return path
+
+
+def _review_trades(trade_ids, db_path):
+    with closing(sqlite3.connect(db_path)) as conn:
+        trades = pd.read_sql_query("""
+            SELECT t.id AS trade_id, t.backtest_id, t.entry_time, t.exit_time, t.entry_price, t.exit_price, t.pnl,
+                   b.ticker, b.strategy_id, b.parameters
+            FROM trades t JOIN backtests b ON b.id = t.backtest_id
+            WHERE t.id IN (SELECT value FROM json_each(?))
+            ORDER BY t.backtest_id, t.id
+        """, conn, params=(json.dumps([int(trade_id) for trade_id in trade_ids]),))
+    for column_name in ('entry_time', 'exit_time'):
+        trades[column_name] = pd.to_datetime(trades[column_name], format='ISO8601')
+    trades['parameters'] = trades['parameters'].map(json.loads)
+    return trades
+
+
+def _lod_bars(data, storage, window_starts, window_ends, max_bars):
+    """
+    Candles of data for a shared source: bars inside a trade window stay as they are, runs of
+    bars outside them are merged k at a time (first open, highest high, lowest low, last close),
+    with k chosen to end up with about max_bars candles. The stop line takes each candle's last value.
+    """
+    times = data.index.as_unit('ns').asi8
+    n = len(times)
+    coverage = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(coverage, np.searchsorted(times, pd.DatetimeIndex(window_starts).as_unit('ns').asi8, 'left'), 1)
+    np.add.at(coverage, np.searchsorted(times, pd.DatetimeIndex(window_ends).as_unit('ns').asi8, 'right'), -1)
+    inside = np.cumsum(coverage[:-1]) > 0
+    n_inside = int(inside.sum())
+    k = max(1, int(np.ceil((n - n_inside) / max(1, max_bars - n_inside))))
+
+    # Position of each bar within its run of outside bars, every k-th one starts a candle
+    run_starts = np.flatnonzero(np.concatenate(([True], inside[1:] != inside[:-1])))
+    run_position = np.arange(n) - np.repeat(run_starts, np.diff(np.append(run_starts, n)))
+    starts = np.flatnonzero(inside | (run_position % k == 0))
+    ends = np.append(starts[1:], n) - 1
+
+    open_, close = data['Open'].to_numpy(dtype=np.float64)[starts], data['Close'].to_numpy(dtype=np.float64)[ends]
+    high = np.fmax.reduceat(data['High'].to_numpy(dtype=np.float64), starts)
+    low = np.fmin.reduceat(data['Low'].to_numpy(dtype=np.float64), starts)
+    positions = pd.DatetimeIndex(storage.date).get_indexer(data.index)
+    stops = np.where(positions >= 0, np.asarray(storage.stop_values, dtype=np.float64)[positions], np.nan)
+    stops[stops == 0] = np.nan  # no open position, the line breaks instead of dropping to 0
+
+    spacing = np.median(np.diff(times)) if n > 1 else 86_400_000_000_000
+    first, last = times[starts], times[ends]
+    return {
+        'x': (first + (last - first) // 2).astype('datetime64[ns]'),
+        'width': (last - first + spacing) * 0.8 / 1e6,  # milliseconds on a datetime axis
+        'open': open_, 'high': high, 'low': low, 'close': close,
+        'top': np.maximum(open_, close), 'bottom': np.minimum(open_, close),
+        'color': np.where(close > open_, "green", np.where(close < open_, "#eb3c40", "grey")),
+        'stop': stops[ends],
+    }
+
+
+def _review_chart(trade, start, end, bars, box_source, trade_source):
+    x, high, low = bars.data['x'], bars.data['high'], bars.data['low']
+    lo, hi = np.searchsorted(x, np.datetime64(start, 'ns')), np.searchsorted(x, np.datetime64(end, 'ns'), 'right')
+    bottom, top = (np.nanmin(low[lo:hi]), np.nanmax(high[lo:hi])) if hi > lo else (trade.entry_price, trade.entry_price)
+    padding = (top - bottom) * 0.05 or top * 0.05
+
+    p = figure(x_axis_type="datetime", tools="pan,wheel_zoom,box_zoom,reset,save", width=1400, height=350,
+               x_range=Range1d(start, end), y_range=Range1d(bottom - padding, top + padding),
+               title=f"Trade {trade.trade_id}: {trade.ticker} {trade.strategy_id}, "
+                     f"{trade.entry_time:%Y-%m-%d} to {trade.exit_time:%Y-%m-%d}, pnl {trade.pnl:.2f}%",
+               background_fill_color="#efefef")
+    p.xaxis.major_label_orientation = 0.8  # radians
+    p.quad(left='left', right='right', bottom='bottom', top='top', source=box_source,
+           fill_alpha=0.1, fill_color="navy", line_color="blue", line_width=0.5)
+    p.segment(x0='x', y0='high', x1='x', y1='low', source=bars, color="black")
+    p.vbar(x='x', width='width', top='top', bottom='bottom', source=bars, fill_color='color', line_color='color')
+    p.line(x='x', y='stop', source=bars, line_width=2, color="red", line_alpha=0.8, legend_label="Stop Loss")
+    p.scatter(x='entry_time', y='entry_price', source=trade_source, marker="triangle", size=12, color="#1c7c55",
+              legend_label="Entry")
+    p.scatter(x='exit_time', y='exit_price', source=trade_source, marker="inverted_triangle", size=12,
+              color="#eb3c40", legend_label="Exit")
+    p.legend.location = "top_left"
+    return p
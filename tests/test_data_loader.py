@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from large_eval_framework import columnar_store as cs
+from large_eval_framework import data_loader as dl
+from large_eval_framework import data_sources as ds
+
+COLUMNS = ['Open', 'Close', 'High', 'Low', 'Volume']
+
+
+def prices(start, end, halt=None, factor=1.0):
+    """Business day bars from start to end (inclusive), without the days of halt, scaled by factor"""
+    index = pd.bdate_range(start, end)
+    if halt is not None:
+        index = index[(index < halt[0]) | (index > halt[1])]
+    days = (index - pd.Timestamp('2000-01-01')).days.to_numpy()
+    value = days * factor
+    return pd.DataFrame({'Open': value, 'High': value + 1, 'Low': value - 1, 'Close': value + .5,
+                         'Volume': days * 10}, index=pd.DatetimeIndex(index, name='Date'))
+
+
+@pytest.fixture(params=["text", "int", "store"])
+def loader(request, tmp_path):
+    source = ds.FileSource(tmp_path / "prices", retries=0)
+    store = cs.ColumnarStore(tmp_path / "store") if request.param == "store" else None
+    loader = dl.DataLoader(str(tmp_path / "cache.db"), int_dates=request.param == "int", store=store, source=source)
+    yield loader
+    loader.close()
+
+
+def requested(loader):
+    """(start, end) of the source requests since the last call, as dates"""
+    ranges = [(pd.Timestamp(start).date(), pd.Timestamp(end).date()) for _, start, end, _ in loader.source.requests]
+    loader.source.requests.clear()
+    return ranges
+
+
+def day(date):
+    return pd.Timestamp(date).date()
+
+
+def test_repeat_fetch_downloads_nothing(loader):
+    loader.source.save('X', prices('2005-01-03', '2012-06-29', halt=('2010-03-01', '2010-03-31')))
+    first = loader.fetch_data('X', '2000-01-01', '2012-06-29')
+    assert requested(loader) == [(day('2000-01-01'), day('2012-06-30'))]
+    # Days before the listing and the halt are missing at the source too
+    again = loader.fetch_data('X', '2000-01-01', '2012-06-29')
+    assert requested(loader) == []
+    assert again.equals(first)
+    assert first.to_numpy().tolist() == prices('2005-01-03', '2012-06-29', halt=('2010-03-01', '2010-03-31'))[COLUMNS].to_numpy().tolist()
+
+
+def test_extending_downloads_the_new_days_with_one_overlapping_bar(loader):
+    loader.source.save('X', prices('2005-01-03', '2012-07-13'))
+    loader.fetch_data('X', '2005-01-03', '2012-06-29')
+    requested(loader)
+    data = loader.fetch_data('X', '2005-01-03', '2012-07-06')
+    assert requested(loader) == [(day('2012-06-29'), day('2012-07-07'))]
+    assert data.index[-1] == pd.Timestamp('2012-07-06')
+    # A Sunday end date adds no business days
+    loader.fetch_data('X', '2011-01-01', '2012-07-08')
+    assert requested(loader) == []
+
+
+def test_legacy_cache_downloads_its_hole_head_and_tail_once(loader):
+    loader.source.save('Y', prices('2001-01-01', '2009-01-05'))
+    # Cached without a download span, missing the first half of 2005
+    loader._cache_data('Y', None, None, prices('2003-01-01', '2008-12-31', halt=('2005-01-01', '2005-06-30')))
+    loader.fetch_data('Y', '2003-01-01', '2008-12-31')
+    assert requested(loader) == [(day('2005-01-01'), day('2005-07-05'))]
+    data = loader.fetch_data('Y', '2000-01-01', '2009-01-05')
+    assert requested(loader) == [(day('2000-01-01'), day('2003-01-01')), (day('2008-12-31'), day('2009-01-06'))]
+    loader.fetch_data('Y', '2000-01-01', '2009-01-05')
+    assert requested(loader) == []
+    assert data.to_numpy().tolist() == prices('2001-01-01', '2009-01-05')[COLUMNS].to_numpy().tolist()
+
+
+def test_days_the_source_did_not_return_yet_are_requested_again(loader):
+    loader.source.save('Z', prices('2024-01-02', '2024-03-29'))
+    assert len(loader.fetch_data('Z', '2024-01-01', '2024-04-30')) == 64
+    loader.source.save('Z', prices('2024-01-02', '2024-06-28'))
+    requested(loader)
+    data = loader.fetch_data('Z', '2024-01-01', '2024-04-30')
+    assert requested(loader) == [(day('2024-03-29'), day('2024-05-01'))]
+    assert data.index[-1] == pd.Timestamp('2024-04-30')
+    assert data.to_numpy().tolist() == prices('2024-01-02', '2024-04-30')[COLUMNS].to_numpy().tolist()
+
+
+def test_days_after_today_are_not_requested_or_recorded(loader, monkeypatch):
+    monkeypatch.setattr(dl, "_today", lambda: pd.Timestamp('2024-03-20'))
+    loader.source.save('F', prices('2024-01-02', '2024-03-08'))
+    loader.fetch_data('F', '2024-01-02', '2024-04-30')
+    assert requested(loader) == [(day('2024-01-02'), day('2024-03-20'))]
+    assert loader._downloaded_span('F')[1] <= pd.Timestamp('2024-03-20')
+    # Only the days after the last bar are requested again, with the last bar itself
+    loader.fetch_data('F', '2024-01-02', '2024-04-30')
+    assert requested(loader) == [(day('2024-03-08'), day('2024-03-20'))]
+
+
+def test_todays_forming_bar_is_not_cached(loader, monkeypatch):
+    monkeypatch.setattr(dl, "_today", lambda: pd.Timestamp('2024-03-06'))
+    loader.source.save('P', prices('2024-01-02', '2024-03-06'))
+    data = loader.fetch_data('P', '2024-01-02', '2024-03-06')
+    assert requested(loader) == [(day('2024-01-02'), day('2024-03-06'))]
+    assert data.index[-1] == pd.Timestamp('2024-03-05')
+    # The source's bar of a day is included, even if it was downloaded with it before the close
+    complete = prices('2024-01-02', '2024-03-06')
+    complete.loc['2024-03-06', 'Close'] += .4
+    loader.source.save('P', complete)
+    loader.fetch_data('P', '2024-01-02', '2024-03-06')
+    monkeypatch.setattr(dl, "_today", lambda: pd.Timestamp('2024-03-07'))
+    requested(loader)
+    data = loader.fetch_data('P', '2024-01-02', '2024-03-06')
+    # The overlap bar (03-05) is complete and unchanged, so no full download
+    assert requested(loader) == [(day('2024-03-05'), day('2024-03-07'))]
+    assert data['Close'].iloc[-1] == complete['Close'].iloc[-1]
+    assert data.to_numpy().tolist() == complete[COLUMNS].to_numpy().tolist()
+
+
+def test_changed_adjustment_downloads_the_whole_history_again(loader):
+    loader.source.save('S', prices('2010-01-04', '2012-06-29'))
+    loader.fetch_data('S', '2010-01-01', '2012-06-29')
+    # A split since: the source's whole history is adjusted by it
+    loader.source.save('S', prices('2010-01-04', '2012-07-13', factor=.5))
+    requested(loader)
+    data = loader.fetch_data('S', '2010-01-01', '2012-07-13')
+    assert requested(loader) == [(day('2012-06-29'), day('2012-07-14')), (day('2010-01-01'), day('2012-07-14'))]
+    assert data.to_numpy().tolist() == prices('2010-01-04', '2012-07-13', factor=.5)[COLUMNS].to_numpy().tolist()
+    loader.fetch_data('S', '2010-01-01', '2012-07-13')
+    assert requested(loader) == []
+
+
+def test_cache_tickers_batches_tickers_missing_the_same_range(loader):
+    for ticker in ('A', 'B', 'C'):
+        loader.source.save(ticker, prices('2020-01-01', '2020-03-31'))
+    assert loader.cache_tickers((ticker, '2020-01-01', '2020-02-28') for ticker in ('A', 'B', 'C')) == []
+    assert [tickers for tickers, _, _, _ in loader.source.requests] == [('A', 'B', 'C')]
+    loader.source.requests.clear()
+    loader.source.save('C', prices('2020-01-01', '2020-03-31', factor=2))
+    assert loader.cache_tickers((ticker, '2020-01-01', '2020-03-31') for ticker in ('A', 'B', 'C')) == []
+    # One batch from the shared last cached day, then C again in full since its prices changed
+    assert [(tickers, day(start)) for tickers, start, _, _ in loader.source.requests] == [
+        (('A', 'B', 'C'), day('2020-02-28')), (('C',), day('2020-01-01'))]
+    assert loader.fetch_data('C', '2020-01-01', '2020-03-31')['Close'].tolist() == \
+        prices('2020-01-01', '2020-03-31', factor=2)['Close'].tolist()
+
+
+def hourly(start, end, until=None):
+    """Bars of 9:00 to 15:00 on the business days from start to end, up to until"""
+    times = pd.DatetimeIndex([day + pd.Timedelta(hours=h) for day in pd.bdate_range(start, end) for h in range(9, 16)])
+    if until is not None:
+        times = times[times <= pd.Timestamp(until)]
+    value = np.arange(len(times), dtype=np.float64) + 10
+    return pd.DataFrame({'Open': value, 'High': value + 1, 'Low': value - 1, 'Close': value + .5,
+                         'Volume': np.full(len(times), 1000)}, index=pd.DatetimeIndex(times, name='Date'))
+
+
+def test_intraday_refetch_gets_the_bars_of_an_ongoing_day(loader, monkeypatch):
+    monkeypatch.setattr(dl, "_today", lambda: pd.Timestamp('2024-03-06'))
+    loader.source.save('H', hourly('2024-03-04', '2024-03-06', until='2024-03-06 12:00'))
+    assert len(loader.fetch_data('H', '2024-03-04', '2024-03-06', '1h')) == 18
+    assert requested(loader) == [(day('2024-03-04'), day('2024-03-07'))]
+
+    later = hourly('2024-03-04', '2024-03-06')
+    later.loc['2024-03-06 12:00', 'Close'] = 99.
+    loader.source.save('H', later)
+    data = loader.fetch_data('H', '2024-03-04', '2024-03-06', '1h')
+    assert requested(loader) == [(day('2024-03-06'), day('2024-03-07'))]
+    assert data.to_numpy().tolist() == later[COLUMNS].to_numpy().tolist()
+
+    # Once the day is over it is downloaded one last time, then it's covered
+    monkeypatch.setattr(dl, "_today", lambda: pd.Timestamp('2024-03-07'))
+    loader.fetch_data('H', '2024-03-04', '2024-03-06', '1h')
+    assert requested(loader) == [(day('2024-03-06'), day('2024-03-07'))]
+    loader.fetch_data('H', '2024-03-04', '2024-03-06', '1h')
+    assert requested(loader) == []
+
+
+def test_rescreening_follows_the_source(loader):
+    loader.source.save('G', prices('2020-01-01', '2021-06-30'))
+    loader.source.save('N', prices('2020-01-01', '2021-06-30'))
+    good = loader.filter_good_tickers(['G', 'N'], save_path=None)
+    assert good['end_date'].tolist() == ['2021-06-30', '2021-06-30']
+
+    loader.source.save('G', prices('2020-01-01', '2022-06-30'))
+    loader.source.requests.clear()
+    # Screened just now: an interrupted or repeated screen doesn't request them again
+    assert loader.filter_good_tickers(['G', 'N'], save_path=None)['end_date'].tolist() == ['2021-06-30'] * 2
+    assert loader.source.requests == []
+    # Expired screens are done again
+    good = loader.filter_good_tickers(['G', 'N'], save_path=None, max_age_hours=0)
+    assert good['end_date'].tolist() == ['2022-06-30', '2021-06-30']
+    assert good['duration_days'].tolist() == [(pd.Timestamp(end) - pd.Timestamp('2020-01-01')).days
+                                              for end in ('2022-06-30', '2021-06-30')]
+    assert loader.fetch_data('G', '2020-01-01', '2022-06-30').index[-1] == pd.Timestamp('2022-06-30')
@@ -0,0 +1,78 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from large_eval_framework import data_sources as ds
+
+
+class StubSource(ds.DataSource):
+    """Fails the first `failures` requests (or those of the tickers in failing), records requests in flight"""
+
+    def __init__(self, failures=0, failing=(), **kwargs):
+        super().__init__(backoff=0, **kwargs)
+        self.failures = failures
+        self.failing = set(failing)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _fetch(self, tickers, start_date, end_date, interval):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self.requests <= self.failures or self.failing.intersection(tickers)
+        try:
+            threading.Event().wait(.01)  # not time.sleep, which a test replaces
+            if fail:
+                raise ConnectionError("rate limited")
+            return {ticker: pd.DataFrame({'Close': [1.0]}, index=pd.DatetimeIndex(['2020-01-02'])) for ticker in tickers}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def test_failing_requests_are_retried():
+    source = StubSource(failures=2, retries=3)
+    assert list(source.download('A')['Close']) == [1.0]
+    assert source.requests == 3
+
+
+def test_request_failing_every_retry_raises():
+    source = StubSource(failures=5, retries=2)
+    with pytest.raises(ConnectionError):
+        source.download('A')
+    assert source.requests == 3
+
+
+def test_backoff_doubles(monkeypatch):
+    waits = []
+    monkeypatch.setattr(ds.time, "sleep", waits.append)
+    source = StubSource(failures=3, retries=3)
+    source.backoff = .5
+    source.download('A')
+    assert waits == [.5, 1.0, 2.0]
+
+
+def test_batches_respect_max_concurrent():
+    source = StubSource(batch_size=2, max_concurrent=3)
+    tickers = [f"T{i}" for i in range(20)]
+    assert sorted(source.download_batch(tickers)) == sorted(tickers)
+    assert source.requests == 10
+    assert source.max_in_flight == 3
+
+
+def test_max_concurrent_holds_across_threads():
+    source = StubSource(max_concurrent=2)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(source.download, [f"T{i}" for i in range(24)]))
+    assert source.max_in_flight == 2
+
+
+def test_batch_failing_after_retries_is_left_out():
+    source = StubSource(failing={"T3"}, batch_size=2, retries=1)
+    frames = source.download_batch([f"T{i}" for i in range(6)])
+    assert sorted(frames) == ["T0", "T1", "T4", "T5"]
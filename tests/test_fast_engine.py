@@ -0,0 +1,62 @@
+import contextlib
+import io
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from backtesting import Backtest
+
+from large_eval_framework import fast_engine as fe
+from large_eval_framework import strategy as strat
+from large_eval_framework import trade_tracker as tt
+
+TRADE_COLUMNS = ['Size', 'EntryBar', 'ExitBar', 'EntryPrice', 'ExitPrice', 'PnL', 'Commission']
+
+
+def random_ticker(seed):
+    """OHLCV of a random ticker (length, price level, volume spikes and dtype vary) and random parameters"""
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(10, 1500))
+    close = np.exp(np.cumsum(rng.normal(.0005, .02, n))) * float(rng.choice([5, 50, 3000, 15000]))
+    open_ = close * (1 + rng.normal(0, .005, n))
+    high = np.maximum(open_, close) * (1 + rng.random(n) * .02)
+    low = np.minimum(open_, close) * (1 - rng.random(n) * .02)
+    volume = rng.integers(10 ** 5, 10 ** 7, n)
+    volume[rng.random(n) < .08] *= 5
+    if seed % 3 == 0:
+        volume = volume.astype(np.float64) * 1.3
+    data = pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                        index=pd.bdate_range('2005-01-03', periods=n))
+    params = dict(volume_multiplier=float(rng.choice([.5, 1, 1.5, 2])), lookback_period=int(rng.integers(5, 260)),
+                  box_period=int(rng.integers(1, 5)), volume_lookback=int(rng.integers(5, 30)),
+                  atr_factor=float(rng.choice([1, 2, 3])))
+    return data, params
+
+
+def tracker(params):
+    trade_tracker = tt.TradeTracker(json_file=None, db_path=":memory:")
+    trade_tracker.start_tracking("S", "X", "2005-01-03", "2010-12-31", params)
+    return trade_tracker
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_fast_engine_matches_backtest(seed):
+    data, params = random_ticker(seed)
+    bt_tracker, fast_tracker = tracker(params), tracker(params)
+    bt_storage, fast_storage = strat.StrategyResults(), strat.StrategyResults()
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        stats = Backtest(data, strat.DarvasJojo, commission=.002, exclusive_orders=True).run(
+            **params, trade_tracker=bt_tracker, strategy_id="S", storage=bt_storage)
+        fast = fe.run_darvas_fast(data, params, strategy_id="S", trade_tracker=fast_tracker, storage=fast_storage)
+
+    assert fast_tracker.trades == bt_tracker.trades
+    assert fast_tracker.current_trade == bt_tracker.current_trade
+    bt_trades = stats._trades[TRADE_COLUMNS].reset_index(drop=True)
+    pd.testing.assert_frame_equal(fast.trades[TRADE_COLUMNS].astype(bt_trades.dtypes.to_dict()), bt_trades)
+    np.testing.assert_array_equal(fast.equity, stats._equity_curve['Equity'].to_numpy())
+    assert (fast_storage.date is None) == (bt_storage.date is None)
+    if bt_storage.date is not None:
+        np.testing.assert_array_equal(fast_storage.stop_values, np.asarray(bt_storage.stop_values))
+        np.testing.assert_array_equal(fast_storage.box_status, np.asarray(bt_storage.box_status))
@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+
+from large_eval_framework import indicator_cache as ic
+
+
+def entry(seed):
+    return (np.random.default_rng(seed).random(2000), np.arange(seed, seed + 10))
+
+
+def directory_bytes(path):
+    return sum(file.stat().st_size for file in path.glob("*.npz"))
+
+
+def test_processes_sharing_a_directory_stay_under_max_bytes(tmp_path):
+    probe = ic.IndicatorCache(tmp_path / "probe")
+    probe.put("probe", entry(0))
+    size = probe.stats()["bytes"]
+    # One cache per pool worker, each only writing its own entries
+    workers = [ic.IndicatorCache(tmp_path / "cache", max_bytes=10 * size) for _ in range(4)]
+    for i in range(40):
+        workers[i % 4].put(f"key{i}", entry(i))
+        assert directory_bytes(tmp_path / "cache") <= 10 * size * 1.05
+    assert sum(worker.evictions for worker in workers) >= 29
+    # The most recently written entries are kept
+    np.testing.assert_array_equal(workers[0].get("key39")[1], entry(39)[1])
+    assert workers[0].get("key0") is None
+
+
+def test_entry_vanishing_during_get_is_a_miss(tmp_path, monkeypatch):
+    cache = ic.IndicatorCache(tmp_path)
+    cache.put("key", entry(1))
+
+    def evicted_meanwhile(path, *args, **kwargs):
+        os.unlink(path)
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(ic.os, "utime", evicted_meanwhile)
+    assert cache.get("key") is None
+    assert cache.stats()["misses"] == 1
+    monkeypatch.undo()
+    assert cache.get("key") is None
+
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from large_eval_framework import runner
+
+FETCH_SECONDS = BACKTEST_SECONDS = .04
+
+
+class SlowLoader:
+    """Fake DataLoader whose fetches sleep like a download and count the datasets still referenced"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.alive = 0
+        self.max_alive = 0
+
+    def fetch_data(self, ticker, start_date, end_date):
+        time.sleep(FETCH_SECONDS)
+        return Dataset(self, ticker)
+
+
+class Dataset:
+    def __init__(self, loader, ticker):
+        self.loader, self.ticker = loader, ticker
+        with loader.lock:
+            loader.alive += 1
+            loader.max_alive = max(loader.max_alive, loader.alive)
+
+    def __del__(self):
+        with self.loader.lock:
+            self.loader.alive -= 1
+
+
+def tasks(n):
+    return [(i, f"T{i}", "2020-01-01", "2020-12-31", []) for i in range(n)]
+
+
+def backtest_all(fetched):
+    tickers = []
+    for task, data in fetched:
+        assert data.ticker == task[1]
+        time.sleep(BACKTEST_SECONDS)
+        tickers.append(task[1])
+        del data  # Done with it, like the runner once a ticker is backtested
+    return tickers
+
+
+def test_prefetch_keeps_order_and_bounds_memory():
+    for depth in (1, 3):
+        loader = SlowLoader()
+        started = time.perf_counter()
+        tickers = backtest_all(runner.prefetch_data(loader, tasks(16), depth))
+        elapsed = time.perf_counter() - started
+        assert tickers == [f"T{i}" for i in range(16)]
+        assert loader.max_alive <= depth + 1
+        # Fetches overlap the backtests, serially it would take 16 * (fetch + backtest)
+        assert elapsed < .8 * 16 * (FETCH_SECONDS + BACKTEST_SECONDS)
+
+
+def test_prefetch_depth_zero_fetches_inline():
+    loader = SlowLoader()
+    assert backtest_all(runner.prefetch_data(loader, tasks(4), 0)) == ["T0", "T1", "T2", "T3"]
+    assert loader.max_alive == 1
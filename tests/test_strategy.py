@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from large_eval_framework import strategy as strat
+
+
+def reference_darvas_boxes(high, low, volume, lookback_period=252, box_period=3, volume_lookback=20):
+    """The original per-bar darvas_boxes loop, kept as the reference for the vectorized one"""
+    high_bounds = np.full_like(high, 0)
+    low_bounds = np.full_like(low, 0)
+    ma_volume = np.full_like(volume, 0)
+    box_status = np.full(len(volume), "NO_BOX", dtype='<U20')
+    remaining_day_forming = box_period
+    for i in range(volume_lookback - 1, len(volume)):
+        ma_volume[i] = np.mean(volume[i - volume_lookback + 1: i + 1])
+
+    for i in range(lookback_period, len(high)):
+        box_status[i] = box_status[i - 1]
+        high_bounds[i] = high_bounds[i - 1]
+        low_bounds[i] = low_bounds[i - 1]
+
+        if high[i] == max(high[i - lookback_period:i + 1]):
+            high_bounds[i] = high[i]
+            low_bounds[i] = low[i]
+            remaining_day_forming = box_period
+            box_status[i] = "NEW_BOX"
+            continue
+
+        if box_status[i] == "BOX_FORMING" or box_status[i] == "NEW_BOX":
+            if low_bounds[i] > low[i]:
+                low_bounds[i] = low[i]
+                remaining_day_forming = box_period
+            else:
+                remaining_day_forming -= 1
+
+            box_status[i] = "BOX_FORMING" if remaining_day_forming > 0 else "IN_BOX"
+            continue
+
+        if box_status[i] == "IN_BOX":
+            box_status[i] = "BOX_CANCELED" if low[i] < low_bounds[i] else "IN_BOX"
+            continue
+
+        if box_status[i] == "BOX_CANCELED":
+            box_status[i] = "NO_BOX"
+            high_bounds[i] = 0
+            low_bounds[i] = 0
+
+    numeric_status = np.array([strat.STATE_MAP[s] for s in box_status])
+    return high_bounds, low_bounds, numeric_status, ma_volume
+
+
+def random_series(seed):
+    """Random walk highs/lows with ties, integer or float volumes and, for some seeds, NaN gaps"""
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 800))
+    steps = rng.normal(0, 1, n).cumsum() + 100
+    high, low = steps + rng.random(n), steps - rng.random(n)
+    if seed % 3 == 0:
+        high, low = np.round(high, 1), np.round(low, 1)
+    volume = rng.integers(1, 10 ** 7, n) if seed % 2 else rng.random(n) * 1e6
+    if seed % 5 == 0:
+        volume = volume.astype(np.float64)
+    if seed % 4 == 1:
+        gaps = rng.random(n) < .05
+        high[gaps], low[gaps] = np.nan, np.nan
+        if volume.dtype.kind == 'f':
+            volume[rng.random(n) < .02] = np.nan
+    params = dict(lookback_period=int(rng.integers(1, 120)), box_period=int(rng.integers(1, 6)),
+                  volume_lookback=int(rng.integers(1, 40)))
+    return high, low, volume, params
+
+
+def assert_same(expected, actual):
+    for e, a in zip(expected, actual):
+        assert e.dtype == a.dtype
+        np.testing.assert_array_equal(e, a)
+
+
+@pytest.mark.parametrize("seed", range(80))
+def test_darvas_boxes_matches_reference(seed):
+    high, low, volume, params = random_series(seed)
+    assert_same(reference_darvas_boxes(high, low, volume, **params), strat.darvas_boxes(high, low, volume, **params))
+
+
+def test_darvas_boxes_batch_matches_reference():
+    high, low, volume, _ = random_series(7)
+    param_sets = [dict(lookback_period=lb, box_period=bp, volume_lookback=vl)
+                  for lb in (5, 20, 60) for bp in (1, 3) for vl in (10, 20)]
+    for params, result in zip(param_sets, strat.darvas_boxes_batch(high, low, volume, param_sets)):
+        assert_same(reference_darvas_boxes(high, low, volume, **params), result)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 5, 9])
+def test_darvas_box_state_in_chunks_matches_reference(seed):
+    high, low, volume, params = random_series(seed)
+    box_state = strat.DarvasBoxState(**params)
+    cuts = np.sort(np.random.default_rng(seed).integers(0, len(high), 4))
+    chunks = [box_state.update(high[a:b], low[a:b], volume[a:b])
+              for a, b in zip(np.concatenate(([0], cuts)), np.concatenate((cuts, [len(high)])))]
+    assert_same(reference_darvas_boxes(high, low, volume, **params),
+                [np.concatenate([chunk[k] for chunk in chunks]) for k in range(4)])
+
+
+def test_rolling_max_handles_nan_like_builtin_max():
+    values = np.array([1., np.nan, 3., 2., np.nan, np.nan, 1.])
+    # A NaN is skipped, unless it starts the window
+    np.testing.assert_array_equal(strat._rolling_max(values, 3), [np.nan, np.nan, 3., np.nan, 3., 2., np.nan])
+    np.testing.assert_array_equal(strat._rolling_max(values, 3)[2:], [max(values[i - 2:i + 1]) for i in range(2, 7)])
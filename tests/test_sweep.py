@@ -0,0 +1,21 @@
+from large_eval_framework import sweep
+
+
+def test_tied_losing_returns_prune_nothing():
+    assert sweep.losing_param_sets(list(range(8)), [-1.5] * 8, 0.5) == set()
+
+
+def test_prunes_the_worst_losing_half():
+    active = [3, 5, 7, 9, 11, 13]
+    assert sweep.losing_param_sets(active, [-4, 2, -1, -3, 1, -2], 0.5) == {3, 9, 13}
+
+
+def test_keeps_the_best_set_even_if_everything_loses():
+    active = list(range(4))
+    losing = sweep.losing_param_sets(active, [-4, -3, -2, -1], 0.99)
+    assert 3 not in losing and len(losing) <= 3
+    assert sweep.losing_param_sets([0, 1], [-2, -1], 1.0) == {0}
+
+
+def test_profitable_sets_are_never_pruned():
+    assert sweep.losing_param_sets(list(range(4)), [1, 2, 3, 4], 0.5) == set()
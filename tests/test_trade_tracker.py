@@ -0,0 +1,57 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from large_eval_framework import analytics
+from large_eval_framework import trade_tracker as tt
+
+
+def record_backtest(tracker, ticker):
+    tracker.start_tracking("S", ticker, "2020-01-01", "2020-12-31", {"lookback_period": 5})
+    tracker.open_trade("S", datetime(2020, 3, 2), 10.0)
+    tracker.close_trade(datetime(2020, 3, 9), 11.0)
+    tracker.finalize_backtest_to_db()
+
+
+def test_failed_flush_keeps_pending_backtests(tmp_path, monkeypatch):
+    tracker = tt.TradeTracker(json_file=None, db_path=str(tmp_path / "trades.db"), flush_every=10)
+    for ticker in ("A", "B", "C"):
+        record_backtest(tracker, ticker)
+
+    def locked(conn, backtest_ids):
+        raise sqlite3.OperationalError("database is locked")
+    with monkeypatch.context() as patch:
+        patch.setattr(analytics, "update_summaries", locked)
+        with pytest.raises(sqlite3.OperationalError):
+            tracker.flush()
+    assert tracker.conn.execute("SELECT COUNT(*) FROM backtests").fetchone()[0] == 0
+
+    assert len(tracker.flush()) == 3
+    assert tracker.flush() == []
+    assert tracker.conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0] == 3
+
+
+def test_processed_pairs_of_some_strategies(tmp_path):
+    tracker = tt.TradeTracker(json_file=None, db_path=str(tmp_path / "trades.db"))
+    for strategy_id in ("Darvas_01", "Darvas_01@1wk", "sweep_0000", "sweep_0001"):
+        tracker.start_tracking(strategy_id, "A", "2020-01-01", "2020-12-31", {})
+        tracker.finalize_backtest_to_db()
+    assert tracker.get_processed_pairs(["Darvas_01", "Darvas_02"]) == {("Darvas_01", "A")}
+    assert len(tracker.get_processed_pairs()) == 4
+
+
+def test_append_after_a_partial_line_keeps_the_new_backtest(tmp_path):
+    results = tmp_path / "results.jsonl"
+    tracker = tt.TradeTracker(json_file=str(results), db_path=str(tmp_path / "trades.db"))
+    for ticker in ("A", "B"):
+        record_backtest(tracker, ticker)
+        tracker.append_trades_to_json()
+    # Killed while writing B's line
+    content = results.read_bytes()
+    results.write_bytes(content[:-20])
+
+    record_backtest(tracker, "C")
+    tracker.append_trades_to_json()
+    trades = tracker.json_to_dataframe(str(results))
+    assert trades['meta_ticker'].tolist() == ["A", "C"]